@@ -0,0 +1,10 @@
+"""Общее ядро автоматов для лабораторных lw3–lw6."""
+
+from .nfa import EPSILON, CompactAutomaton
+from .closure import epsilon_closures
+from .dfa import determinize
+from .incremental import IncrementalDFA
+from .minimize import minimize, remove_unreachable_states
+from .regex_dfa import regex_to_dfa, rules_to_dfa
+from .thompson import thompson_nfa, union_nfa
+from .cache import CompileCache, tree_key
@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .binary_io import is_binary
+from .table_io import dump_automaton
+
+
+def read_manifest(filename):
+    """Входы пакета: список пар (вход, имя выходного файла или None).
+
+    .jsonl — по JSON-объекту {"input": ..., "output": ...} (или просто строке)
+    в строке файла; любой другой файл — по входу в строке, пустые строки
+    пропускаются.
+    """
+    items = []
+    jsonl = filename.endswith('.jsonl')
+    with open(filename, 'r', encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                continue
+            if not jsonl:
+                items.append((line, None))
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                raise ValueError(f"Bad manifest line {number}: {error}")
+            if isinstance(record, str):
+                items.append((record, None))
+            else:
+                items.append((record["input"], record.get("output")))
+    return items
+
+
+def _run_item(task):
+    """Один вход в процессе-работнике; ошибка не роняет весь пакет."""
+    build, item, name = task
+    try:
+        return name, dump_automaton(build(item), is_binary(name)), None
+    except Exception as error:
+        return name, None, f"{type(error).__name__}: {error}"
+
+
+def run_batch(items, build, output, jobs=None, suffix=".csv", chunksize=64):
+    """Строит автомат build(вход) для каждого входа и складывает файлы в каталог или .zip.
+
+    build должен быть функцией уровня модуля (или functools.partial от неё),
+    чтобы её можно было передать в пул процессов. Результаты пишет только
+    родительский процесс, поэтому архив собирается без блокировок.
+    Входы, чьё имя выходного файла уже занято более ранним входом, не
+    строятся и считаются ошибками, а не перезаписывают чужой результат.
+    Возвращает (число входов, число ошибок, секунды).
+    """
+    width = len(str(len(items)))
+    tasks = []
+    duplicates = []
+    owners = {}  # нормализованное имя -> вход, которому оно досталось
+    for index, (item, name) in enumerate(items, 1):
+        name = name or f"{index:0{width}d}{suffix}"
+        key = os.path.normpath(name).replace(os.sep, '/')
+        if key in owners:
+            duplicates.append((name, item, owners[key]))
+        else:
+            owners[key] = item
+            tasks.append((build, item, name))
+
+    started = time.perf_counter()
+    if output.endswith('.zip'):
+        archive = zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED)
+        store = archive.writestr
+    else:
+        archive = None
+        os.makedirs(output, exist_ok=True)
+
+        def store(name, data):
+            path = os.path.join(output, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(data)
+
+    failed = len(duplicates)
+    for name, item, owner in duplicates:
+        print(f"{name}: duplicate output name, already used for input {owner!r} (input {item!r})", file=sys.stderr)
+
+    def collect(results):
+        nonlocal failed
+        for (_, item, _), (name, data, error) in zip(tasks, results):
+            if error is not None:
+                failed += 1
+                print(f"{name}: {error} (input {item!r})", file=sys.stderr)
+            else:
+                store(name, data)
+
+    try:
+        if jobs == 1:
+            collect(map(_run_item, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                # входы мелкие, поэтому отдаём работникам пачками
+                collect(pool.map(_run_item, tasks, chunksize=chunksize))
+    finally:
+        if archive is not None:
+            archive.close()
+
+    return len(items), failed, time.perf_counter() - started
+
+
+def report(count, failed, seconds):
+    rate = count / seconds if seconds > 0 else float('inf')
+    print(f"Processed {count} items ({failed} failed) in {seconds:.2f} s, {rate:.1f} items/s")
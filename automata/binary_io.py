@@ -0,0 +1,202 @@
+import mmap
+import struct
+import sys
+from array import array
+from contextlib import nullcontext
+
+from . import metrics
+from .nfa import CompactAutomaton
+
+# Двоичный формат автомата (все числа — little-endian uint32, секции выровнены на 4):
+#   заголовок: MAGIC, версия, число состояний, символов, разных выходов,
+#              стартовое состояние, число переходов по символам, число ε-переходов;
+#   таблицы строк: символы, выходы (каждый разный выход один раз), имена состояний;
+#   output_ids[n]                   — номер выхода состояния в таблице выходов;
+#   move_ptr[n + 1], move_sym[m], move_dst[m] — переходы в формате CSR;
+#   eps_ptr[n + 1], eps_dst[e]      — ε-переходы, тоже CSR.
+# Таблица строк: число строк, длина в байтах, смещения count + 1 в символах, UTF-8 текст.
+MAGIC = b"AUTB"
+VERSION = 1
+BINARY_SUFFIX = ".aut"
+
+_HEADER = struct.Struct("<4s7I")
+_SWAP = sys.byteorder != "little"
+
+
+def _u32(values):
+    data = array('I', values)
+    if _SWAP:
+        data.byteswap()
+    return data.tobytes()
+
+
+def _string_table(strings):
+    text = "".join(strings)
+    offsets = [0]
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+    blob = text.encode('utf-8')
+    padding = b"\0" * (-len(blob) % 4)
+    return _u32([len(strings), len(blob)]) + _u32(offsets) + blob + padding
+
+
+@metrics.timed("binary.write")
+def write_binary(automaton, filename):
+    """Записывает CompactAutomaton в двоичный формат (в файл по имени или в открытый двоичный)."""
+    n = len(automaton)
+    output_table = list(dict.fromkeys(automaton.outputs))
+    output_index = {output: i for i, output in enumerate(output_table)}
+
+    move_ptr = [0]
+    move_sym = []
+    move_dst = []
+    eps_ptr = [0]
+    eps_dst = []
+    for s in range(n):
+        for aid, targets in automaton.moves[s].items():
+            move_sym.extend([aid] * len(targets))
+            move_dst.extend(targets)
+        move_ptr.append(len(move_dst))
+        eps_dst.extend(automaton.eps[s])
+        eps_ptr.append(len(eps_dst))
+
+    target = open(filename, 'wb') if isinstance(filename, str) else nullcontext(filename)
+    with target as file:
+        written = file.write(_HEADER.pack(MAGIC, VERSION, n, len(automaton.symbols), len(output_table),
+                                          automaton.start, len(move_dst), len(eps_dst)))
+        written += file.write(_string_table(automaton.symbols))
+        written += file.write(_string_table(output_table))
+        written += file.write(_string_table(automaton.state_names))
+        for section in ([output_index[output] for output in automaton.outputs],
+                        move_ptr, move_sym, move_dst, eps_ptr, eps_dst):
+            written += file.write(_u32(section))
+    metrics.count("binary.bytes_written", written)
+
+
+class MappedAutomaton:
+    """Двоичный автомат, отображённый в память без копирования.
+
+    Числовые секции доступны как memoryview формата 'I' прямо поверх mmap,
+    строки декодируются один раз при открытии. Пока объект не закрыт,
+    файл остаётся отображённым.
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        view = memoryview(self._map)
+        self._views.append(view)
+        if len(view) < _HEADER.size:
+            raise ValueError("Truncated automaton file")
+        magic, version, n, k, n_outputs, start, m, e = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a binary automaton file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported binary automaton version {version}")
+        self.start = start
+        metrics.count("binary.bytes_mapped", len(view))
+        pos = _HEADER.size
+
+        def u32(count):
+            nonlocal pos
+            end = pos + 4 * count
+            if end > len(view):
+                raise ValueError("Truncated automaton file")
+            if _SWAP:
+                section = array('I', view[pos:end].tobytes())
+                section.byteswap()
+            else:
+                section = view[pos:end].cast('I')
+                self._views.append(section)
+            pos = end
+            return section
+
+        def strings():
+            nonlocal pos
+            count, size = u32(2)
+            offsets = u32(count + 1)
+            text = bytes(view[pos:pos + size]).decode('utf-8')
+            pos += size + (-size % 4)
+            return [text[offsets[i]:offsets[i + 1]] for i in range(count)]
+
+        self.symbols = strings()
+        self.output_table = strings()
+        self.state_names = strings()
+        if len(self.symbols) != k or len(self.output_table) != n_outputs or len(self.state_names) != n:
+            raise ValueError("Corrupted automaton file")
+        self.output_ids = u32(n)
+        self.move_ptr = u32(n + 1)
+        self.move_sym = u32(m)
+        self.move_dst = u32(m)
+        self.eps_ptr = u32(n + 1)
+        self.eps_dst = u32(e)
+
+    def __len__(self):
+        return len(self.state_names)
+
+    def to_compact(self):
+        """Обычный CompactAutomaton (с копированием переходов в словари)."""
+        automaton = CompactAutomaton()
+        n = len(self)
+        automaton.symbols = list(self.symbols)
+        automaton.symbol_index = {symbol: aid for aid, symbol in enumerate(self.symbols)}
+        automaton.state_names = list(self.state_names)
+        automaton.state_index = {name: sid for sid, name in enumerate(self.state_names)}
+        output_table = self.output_table
+        automaton.outputs = [output_table[i] for i in self.output_ids]
+        automaton.start = self.start
+
+        move_ptr = self.move_ptr.tolist()
+        move_sym = self.move_sym.tolist()
+        move_dst = self.move_dst.tolist()
+        eps_ptr = self.eps_ptr.tolist()
+        eps_dst = self.eps_dst.tolist()
+        moves = []
+        for s in range(n):
+            row = {}
+            for j in range(move_ptr[s], move_ptr[s + 1]):
+                targets = row.get(move_sym[j])
+                if targets is None:
+                    row[move_sym[j]] = [move_dst[j]]
+                else:
+                    targets.append(move_dst[j])
+            moves.append(row)
+        automaton.moves = moves
+        automaton.eps = [eps_dst[eps_ptr[s]:eps_ptr[s + 1]] for s in range(n)]
+        return automaton
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+@metrics.timed("binary.read")
+def read_binary(filename):
+    with MappedAutomaton(filename) as mapped:
+        return mapped.to_compact()
+
+
+def is_binary(filename):
+    return filename.endswith(BINARY_SUFFIX)
+
+
+def has_binary_magic(filename):
+    """Двоичный ли файл автомата — по сигнатуре, а не по имени."""
+    with open(filename, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+from .minimize import minimize
+from .regex_dfa import regex_to_dfa
+from .thompson import thompson_nfa
+
+# стадии компиляции: НКА Томпсона, ДКА по followpos, минимальный ДКА
+STAGES = ("nfa", "dfa", "min")
+
+# меняется при несовместимых изменениях построителей, чтобы старые файлы на диске не подхватывались
+_VERSION = b"1"
+
+
+def tree_keys(tree):
+    """Ключи всех узлов дерева parse_regex: {id(узла): hex-дайджест}.
+
+    Ключ узла — хэш его типа и ключей детей, поэтому одинаковые по строению
+    поддеревья получают один ключ, а общее поддерево считается один раз.
+    """
+    keys = {}
+    stack = [(tree, False)]
+    while stack:
+        node, done = stack.pop()
+        if id(node) in keys:
+            continue
+        kind = node['type']
+        if not done:
+            stack.append((node, True))
+            if kind in ('Concat', 'Or'):
+                stack.append((node['right'], False))
+                stack.append((node['left'], False))
+            elif kind in ('Repeat', 'Plus'):
+                stack.append((node['expr'], False))
+            continue
+
+        if kind == 'Literal':
+            payload = b"L" + node['value'].encode('utf-8')
+        elif kind in ('Concat', 'Or'):
+            payload = kind[0].encode() + keys[id(node['left'])].encode() + keys[id(node['right'])].encode()
+        elif kind in ('Repeat', 'Plus'):
+            payload = kind[0].encode() + keys[id(node['expr'])].encode()
+        else:
+            raise ValueError(f"Unknown node type '{kind}'")
+        keys[id(node)] = hashlib.blake2b(_VERSION + payload, digest_size=16).hexdigest()
+    return keys
+
+
+def tree_key(tree):
+    return tree_keys(tree)[id(tree)]
+
+
+class CompileCache:
+    """Кэш автоматов по содержимому регулярного выражения.
+
+    Ключ — (tree_key, стадия). В памяти держится не больше maxsize
+    последних автоматов (LRU); если задан directory, результаты ещё и
+    складываются туда pickle-файлами и переживают процесс. Возвращаемые
+    автоматы общие для всех вызовов, менять их нельзя.
+    """
+
+    def __init__(self, maxsize=256, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key, stage):
+        return os.path.join(self.directory, f"{key}.{stage}.pickle")
+
+    def _lookup(self, key, stage):
+        entry = self._entries.get((key, stage))
+        if entry is not None:
+            self._entries.move_to_end((key, stage))
+            return entry
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key, stage), 'rb') as file:
+                entry = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        self._remember(key, stage, entry)
+        return entry
+
+    def _remember(self, key, stage, automaton):
+        self._entries[(key, stage)] = automaton
+        self._entries.move_to_end((key, stage))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _store(self, key, stage, automaton):
+        self._remember(key, stage, automaton)
+        if self.directory is None:
+            return
+        # запись через временный файл: параллельные процессы не увидят половину
+        path = self._path(key, stage)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as file:
+            pickle.dump(automaton, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def get(self, tree, stage):
+        """Автомат выражения tree на стадии stage ('nfa', 'dfa' или 'min')."""
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage '{stage}'")
+        keys = tree_keys(tree)
+        key = keys[id(tree)]
+
+        automaton = self._lookup(key, stage)
+        if automaton is not None:
+            self.hits += 1
+            return automaton
+        self.misses += 1
+
+        if stage == "nfa":
+            # готовые НКА других выражений подставляются как фрагменты
+            automaton = thompson_nfa(tree, keys, lambda k: self._entries.get((k, "nfa")))
+        elif stage == "dfa":
+            automaton = regex_to_dfa(tree)
+        else:
+            automaton = minimize(self.get(tree, "dfa"))
+        self._store(key, stage, automaton)
+        return automaton
+
+    def clear(self):
+        """Очищает только память; файлы на диске остаются."""
+        self._entries.clear()
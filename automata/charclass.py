@@ -0,0 +1,235 @@
+from bisect import bisect_right
+
+from .nfa import EPSILON
+from .regex_dfa import literal, union
+
+MAX_CHAR = 0x10FFFF
+
+# готовые классы для escape-последовательностей \d, \w, \s
+DIGITS = [(ord('0'), ord('9'))]
+WORD = [(ord('0'), ord('9')), (ord('A'), ord('Z')), (ord('_'), ord('_')), (ord('a'), ord('z'))]
+SPACE = [(ord('\t'), ord('\r')), (ord(' '), ord(' '))]
+
+_LABEL_SPECIAL = set('\\]-^')
+
+
+def normalize(ranges):
+    """Сортирует и сливает пересекающиеся и соседние диапазоны (lo, hi)."""
+    result = []
+    for lo, hi in sorted(ranges):
+        if result and lo <= result[-1][1] + 1:
+            if hi > result[-1][1]:
+                result[-1] = (result[-1][0], hi)
+        else:
+            result.append((lo, hi))
+    return result
+
+
+def complement(ranges):
+    result = []
+    next_lo = 0
+    for lo, hi in normalize(ranges):
+        if lo > next_lo:
+            result.append((next_lo, lo - 1))
+        next_lo = hi + 1
+    if next_lo <= MAX_CHAR:
+        result.append((next_lo, MAX_CHAR))
+    return result
+
+
+def _escape(code):
+    char = chr(code)
+    if char in _LABEL_SPECIAL:
+        return '\\' + char
+    if char.isprintable() and not char.isspace():
+        return char
+    return f"\\u{{{code:x}}}"
+
+
+def class_label(ranges):
+    """Имя символа таблицы для класса: сам символ, если он один, иначе [a-z...]."""
+    if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+        return chr(ranges[0][0])
+    parts = []
+    for lo, hi in ranges:
+        parts.append(_escape(lo) if lo == hi else f"{_escape(lo)}-{_escape(hi)}")
+    return "[" + "".join(parts) + "]"
+
+
+def parse_class_label(label):
+    """Диапазоны класса по имени из class_label; None, если это не класс."""
+    if len(label) == 1:
+        return [(ord(label), ord(label))]
+    if len(label) < 3 or label[0] != '[' or label[-1] != ']':
+        return None
+
+    codes = []  # символы и '-' между ними
+    i = 1
+    end = len(label) - 1
+    while i < end:
+        char = label[i]
+        if char == '\\':
+            if label.startswith('\\u{', i):
+                close = label.index('}', i)
+                codes.append(int(label[i + 3:close], 16))
+                i = close + 1
+            else:
+                codes.append(ord(label[i + 1]))
+                i += 2
+        elif char == '-':
+            codes.append(None)
+            i += 1
+        else:
+            codes.append(ord(char))
+            i += 1
+
+    ranges = []
+    i = 0
+    while i < len(codes):
+        if i + 2 < len(codes) and codes[i + 1] is None:
+            ranges.append((codes[i], codes[i + 2]))
+            i += 3
+        elif codes[i] is None:
+            return None
+        else:
+            ranges.append((codes[i], codes[i]))
+            i += 1
+    return ranges
+
+
+def partition(sets):
+    """Разбиение алфавита на непересекающиеся классы эквивалентности.
+
+    sets — списки диапазонов (литерал — один диапазон из одного символа).
+    Два символа попадают в один класс, если входят ровно в одни и те же
+    множества. Возвращает (классы как списки диапазонов, для каждого
+    множества — отсортированные номера его классов).
+    """
+    events = {}
+    for index, ranges in enumerate(sets):
+        for lo, hi in ranges:
+            events.setdefault(lo, []).append(index)
+            events.setdefault(hi + 1, []).append(index)
+
+    classes = []
+    class_of = {}  # набор множеств -> номер класса
+    members = [set() for _ in sets]
+    active = set()
+    points = sorted(events)
+    for point, next_point in zip(points, points[1:]):
+        for index in events[point]:
+            # внутри одного множества диапазоны не пересекаются: вход и выход чередуются
+            if index in active:
+                active.remove(index)
+            else:
+                active.add(index)
+        if not active:
+            continue
+        signature = frozenset(active)
+        cid = class_of.get(signature)
+        if cid is None:
+            cid = class_of[signature] = len(classes)
+            classes.append([])
+            for index in signature:
+                members[index].add(cid)
+        interval = classes[cid]
+        if interval and interval[-1][1] + 1 == point:
+            interval[-1] = (interval[-1][0], next_point - 1)
+        else:
+            interval.append((point, next_point - 1))
+
+    return classes, [sorted(cids) for cids in members]
+
+
+class SymbolMap(dict):
+    """Символ входа -> значение столбца для таблиц с именами-классами.
+
+    Имена из таблицы ищутся напрямую, прочие символы (str или код символа) —
+    по диапазонам одиночных символов и классов [..]; найденное запоминается,
+    так что годится и как таблица для str.translate.
+    """
+
+    def __init__(self, symbols, values, default):
+        super().__init__()
+        self.default = default
+        ranges = []
+        for symbol, value in zip(symbols, values):
+            self[symbol] = value
+            for lo, hi in parse_class_label(symbol) or ():
+                ranges.append((lo, hi, value))
+        ranges.sort()
+        self._starts = [lo for lo, _, _ in ranges]
+        self._ranges = ranges
+
+    def __missing__(self, key):
+        code = key if isinstance(key, int) else ord(key) if len(key) == 1 else -1
+        i = bisect_right(self._starts, code) - 1
+        if i >= 0 and code <= self._ranges[i][1]:
+            value = self._ranges[i][2]
+        else:
+            value = self.default
+        self[key] = value
+        return value
+
+
+def compress_classes(tree):
+    """Заменяет узлы Class дерева parse_regex классами эквивалентности.
+
+    Алфавит выражения делится partition на непересекающиеся классы по всем
+    литералам и узлам {"type": "Class", "ranges": [...]}. Литерал становится
+    символом своего класса (одиночный символ так и остаётся собой), узел
+    Class — объединением символов своих классов, так что в таблицах НКА/ДКА
+    по столбцу на класс, а не на каждый символ диапазона.
+    """
+    return compress_forest([tree])[0]
+
+
+def compress_forest(trees):
+    """То же для нескольких деревьев с общим разбиением алфавита.
+
+    Нужно, когда выражения сливаются в один автомат: у всех деревьев одни
+    и те же символы-классы, и классы разных выражений не пересекаются.
+    """
+    nodes = []
+    stack = list(reversed(trees))
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        if node['type'] in ('Concat', 'Or'):
+            stack.append(node['right'])
+            stack.append(node['left'])
+        elif node['type'] in ('Repeat', 'Plus'):
+            stack.append(node['expr'])
+    if not any(node['type'] == 'Class' for node in nodes):
+        return list(trees)
+
+    sets = {}  # id(узла) -> номер множества
+    ranges = []
+    for node in nodes:
+        if node['type'] == 'Class':
+            sets[id(node)] = len(ranges)
+            ranges.append(node['ranges'])
+        elif node['type'] == 'Literal' and node['value'] != EPSILON:
+            code = ord(node['value'])
+            sets[id(node)] = len(ranges)
+            ranges.append([(code, code)])
+    classes, members = partition(ranges)
+    labels = [class_label(interval) for interval in classes]
+
+    # узлы пересобираются снизу вверх: nodes идут в прямом порядке обхода
+    built = {}
+    for node in reversed(nodes):
+        kind = node['type']
+        if kind in ('Literal', 'Class') and id(node) in sets:
+            cids = members[sets[id(node)]]
+            if not cids:
+                raise ValueError("Empty character class")
+            new = union([literal(labels[cid]) for cid in cids])
+        elif kind in ('Concat', 'Or'):
+            new = {"type": kind, "left": built[id(node['left'])], "right": built[id(node['right'])]}
+        elif kind in ('Repeat', 'Plus'):
+            new = {"type": kind, "expr": built[id(node['expr'])]}
+        else:
+            new = node
+        built[id(node)] = new
+    return [built[id(tree)] for tree in trees]
@@ -0,0 +1,165 @@
+from . import metrics
+
+
+def iter_bits(mask):
+    """Номера единичных битов маски по возрастанию."""
+    if not mask:
+        return
+    # сдвиг к младшему биту: у локальных замыканий строка получается короткой
+    low = (mask & -mask).bit_length() - 1
+    bits = bin(mask >> low)[:1:-1]
+    i = bits.find('1')
+    while i >= 0:
+        yield low + i
+        i = bits.find('1', i + 1)
+
+
+def mask_of(ids):
+    """Маска по номерам; собирается в bytearray, а не OR-ами растущего числа."""
+    bits = bytearray()
+    for i in ids:
+        byte = i >> 3
+        if byte >= len(bits):
+            bits.extend(bytes(byte + 1 - len(bits)))
+        bits[byte] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+
+# Множество состояний хранится как пара (low, mask): low — наименьший номер,
+# mask — биты относительно него (младший бит всегда 1). Маска занимает
+# столько бит, сколько номеров между крайними элементами, а не до самого
+# старшего номера НКА, так что у локальных множеств большого НКА она короткая.
+# Форма однозначна, поэтому пара годится ключом словаря подмножеств.
+
+def relative_of(ids):
+    """(low, mask) для непустого набора номеров."""
+    ids = list(ids)
+    low = min(ids)
+    mask = 0
+    for i in ids:
+        mask |= 1 << (i - low)
+    return low, mask
+
+
+def union_of(sets):
+    """Объединение непустого набора множеств (low, mask)."""
+    base = None
+    acc = 0
+    for low, mask in sets:
+        if base is None:
+            base, acc = low, mask
+        elif low >= base:
+            acc |= mask << (low - base)
+        else:
+            acc = (acc << (base - low)) | mask
+            base = low
+    return base, acc
+
+
+def iter_set(subset):
+    """Номера множества (low, mask) по возрастанию."""
+    low, mask = subset
+    for i in iter_bits(mask):
+        yield low + i
+
+
+def strongly_connected_components(successors):
+    """Итеративный алгоритм Тарьяна.
+
+    Возвращает (component, count): component[v] — номер компоненты вершины,
+    компоненты нумеруются в обратном топологическом порядке, то есть
+    все компоненты, достижимые из данной, имеют меньший номер.
+    """
+    n = len(successors)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    component = [-1] * n
+    stack = []
+    counter = 0
+    comp_count = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+
+        while work:
+            v, i = work[-1]
+            edges = successors[v]
+            if i < len(edges):
+                work[-1] = (v, i + 1)
+                w = edges[i]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, 0))
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component[w] = comp_count
+                    if w == v:
+                        break
+                comp_count += 1
+
+    return component, comp_count
+
+
+@metrics.timed("epsilon_closures")
+def epsilon_closures(nfa):
+    """ε-замыкания всех состояний как множества (low, mask).
+
+    ε-циклы стягиваются в компоненты сильной связности, после чего замыкания
+    считаются за один проход по конденсации: каждая компонента наследует
+    замыкания компонент, в которые из неё ведут ε-переходы.
+    """
+    component, comp_count = strongly_connected_components(nfa.eps)
+
+    # состояния идут по возрастанию: первое в компоненте — наименьшее
+    lows = [-1] * comp_count
+    members = [0] * comp_count
+    for v, c in enumerate(component):
+        if lows[c] < 0:
+            lows[c] = v
+        members[c] |= 1 << (v - lows[c])
+
+    comp_edges = [set() for _ in range(comp_count)]
+    for v, targets in enumerate(nfa.eps):
+        c = component[v]
+        for w in targets:
+            if component[w] != c:
+                comp_edges[c].add(component[w])
+
+    closure = [None] * comp_count
+    for c in range(comp_count):
+        base, acc = lows[c], members[c]
+        for d in comp_edges[c]:
+            low, mask = closure[d]
+            if low >= base:
+                acc |= mask << (low - base)
+            else:
+                acc = (acc << (base - low)) | mask
+                base = low
+        closure[c] = (base, acc)
+
+    if metrics.ENABLED:
+        metrics.count("epsilon_closures.components", comp_count)
+        for _, mask in closure:
+            metrics.observe("epsilon_closures.closure_size", bin(mask).count('1'))
+    return [closure[c] for c in component]
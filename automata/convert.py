@@ -0,0 +1,19 @@
+"""Перевод автомата между CSV-таблицей и двоичным форматом .aut.
+
+python -m automata.convert input.csv output.aut
+"""
+import sys
+
+from .table_io import load_automaton, save_automaton
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python -m automata.convert input.csv|input.aut output.csv|output.aut")
+        sys.exit(1)
+    save_automaton(load_automaton(sys.argv[1]), sys.argv[2])
+    print(f"Moore automaton exported to {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
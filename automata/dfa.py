@@ -0,0 +1,87 @@
+from collections import deque
+
+from . import metrics
+from .closure import epsilon_closures, iter_bits, mask_of
+from .nfa import CompactAutomaton
+
+_EMPTY = (-1, 0)  # по символу ещё не набрано ни одного замыкания
+
+
+@metrics.timed("determinize")
+def determinize(nfa, closures=None):
+    """Построение подмножеств.
+
+    Состояние ДКА — ε-замкнутое множество состояний НКА в форме (low, mask)
+    из closure: объединение замыканий делается OR-ами сдвинутых масок, а
+    память на подмножество растёт с его разбросом номеров, а не с размером
+    НКА. Выход состояния ДКА — первый непустой выход его состояний НКА в
+    порядке их номеров: для обычного НКА это "F", для объединения
+    шаблонов — номер более раннего шаблона.
+    """
+    if closures is None:
+        closures = epsilon_closures(nfa)
+
+    dfa = CompactAutomaton()
+    dfa.symbols = list(nfa.symbols)
+    dfa.symbol_index = dict(nfa.symbol_index)
+
+    outputs = nfa.outputs
+    moves = nfa.moves
+    # маски по всему НКА только сдвигаются к подмножеству: O(n / 64) слов
+    # на состояние ДКА, и результат сразу обрезается по его маске
+    final_mask = mask_of(s for s, output in enumerate(outputs) if output)
+    movers_mask = mask_of(s for s, row in enumerate(moves) if row)
+
+    def output_of(subset):
+        low, mask = subset
+        mask &= final_mask >> low
+        if not mask:
+            return ""
+        # младший бит — состояние с наименьшим номером
+        return outputs[low + (mask & -mask).bit_length() - 1]
+
+    start = closures[nfa.start]
+    subset_ids = {start: dfa.state_id("S0", output_of(start))}
+    queue = deque([start])
+    collect = metrics.ENABLED
+
+    while queue:
+        if collect:
+            metrics.observe("determinize.queue_length", len(queue))
+        subset = queue.popleft()
+        src = subset_ids[subset]
+
+        # targets[aid] — объединение замыканий целей в форме (low, mask)
+        targets = {}
+        base, bits = subset
+        for i in iter_bits(bits & (movers_mask >> base)):
+            for aid, succ in moves[base + i].items():
+                acc_low, acc = targets.get(aid, _EMPTY)
+                for t in succ:
+                    low, mask = closures[t]
+                    if low == acc_low:
+                        acc |= mask
+                    elif acc_low < 0:
+                        acc_low, acc = low, mask
+                    elif low > acc_low:
+                        acc |= mask << (low - acc_low)
+                    else:
+                        acc = (acc << (acc_low - low)) | mask
+                        acc_low = low
+                targets[aid] = (acc_low, acc)
+
+        for aid in sorted(targets):
+            target = targets[aid]
+            dst = subset_ids.get(target)
+            if dst is None:
+                dst = dfa.state_id(f"S{len(dfa)}", output_of(target))
+                subset_ids[target] = dst
+                queue.append(target)
+            dfa.moves[src][aid] = [dst]
+
+    if collect:
+        metrics.count("determinize.nfa_states", len(nfa))
+        metrics.count("determinize.dfa_states", len(dfa))
+        for _, mask in subset_ids:
+            metrics.observe("determinize.subset_size", bin(mask).count('1'))
+    return dfa
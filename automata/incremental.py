@@ -0,0 +1,181 @@
+import os
+import pickle
+from collections import deque
+
+from . import metrics
+from .closure import epsilon_closures, iter_bits, iter_set, relative_of, union_of
+from .dfa import determinize
+from .nfa import CompactAutomaton
+
+
+class IncrementalDFA:
+    """Построение подмножеств, которое переживает небольшие правки НКА.
+
+    Между вызовами update хранятся строки НКА по именам состояний,
+    ε-замыкания и переходы всех подмножеств ДКА. Подмножество — пара
+    (low, mask) из closure над постоянной нумерацией имён, поэтому
+    перенумерация состояний в новой таблице ничего не сбивает. При новой версии НКА заново считаются только
+    подмножества, в которые входит состояние с изменившимися переходами
+    или с переходом в состояние с изменившимся замыканием; переходы
+    остальных берутся из прошлого прогона. Номера S0, S1, ... раздаются
+    тем же обходом в ширину, что и в determinize, так что результат
+    совпадает с полным перестроением (см. verify).
+    """
+
+    # версия формата сохранённого состояния: файлы старой версии не читаются
+    FORMAT = 2
+
+    def __init__(self):
+        self.format = self.FORMAT
+        self._bits = {}  # имя состояния НКА -> номер бита
+        self._rows = {}  # имя -> (выход, {символ: имена}, ε-имена)
+        self._closures = {}  # бит -> замыкание (low, mask)
+        self._subsets = {}  # подмножество -> {символ: подмножество}
+        self.reused = 0
+        self.recomputed = 0
+
+    @classmethod
+    def load(cls, filename):
+        """Состояние из файла или пустое, если файла ещё нет или он старого формата."""
+        if not os.path.exists(filename):
+            return cls()
+        with open(filename, 'rb') as file:
+            state = pickle.load(file)
+        if getattr(state, 'format', None) != cls.FORMAT:
+            return cls()
+        return state
+
+    def save(self, filename):
+        tmp = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, filename)
+
+    def __len__(self):
+        """Сколько подмножеств ДКА запомнено с прошлого update."""
+        return len(self._subsets)
+
+    def _bit(self, name):
+        bit = self._bits.get(name)
+        if bit is None:
+            bit = self._bits[name] = len(self._bits)
+        return bit
+
+    def _changed_closures(self, nfa, bits, eps_changed):
+        """Обновляет замыкания; возвращает биты, у которых замыкание стало другим."""
+        old = self._closures
+        if not eps_changed:
+            # ε-переходы те же: у старых состояний замыкания прежние, новые замкнуты на себя
+            changed = set()
+            for bit in bits:
+                if bit not in old:
+                    old[bit] = (bit, 1)
+                    changed.add(bit)
+            return changed
+
+        closures = {}
+        for s, (low, mask) in enumerate(epsilon_closures(nfa)):
+            closures[bits[s]] = relative_of(bits[low + i] for i in iter_bits(mask))
+        self._closures = closures
+        return {bit for bit, mask in closures.items() if old.get(bit) != mask}
+
+    @metrics.timed("incremental.update")
+    def update(self, nfa):
+        """ДКА для новой версии НКА (как determinize(nfa)) с переиспользованием прошлых подмножеств."""
+        names = nfa.state_names
+        bits = [self._bit(name) for name in names]
+
+        rows = {}
+        for s, name in enumerate(names):
+            moves = {nfa.symbols[aid]: frozenset(names[t] for t in targets)
+                     for aid, targets in nfa.moves[s].items()}
+            rows[name] = (nfa.outputs[s], moves, frozenset(names[t] for t in nfa.eps[s]))
+
+        old_rows = self._rows
+        no_row = ("", {}, frozenset())
+        dirty = set()
+        eps_changed = False
+        for name in rows.keys() | old_rows.keys():
+            row = rows.get(name, no_row)
+            old_row = old_rows.get(name, no_row)
+            if row[1] != old_row[1]:
+                dirty.add(self._bits[name])
+            if row[2] != old_row[2]:
+                eps_changed = True
+        self._rows = rows
+
+        changed = self._changed_closures(nfa, bits, eps_changed)
+        if changed:
+            # переход в состояние с новым замыканием ведёт в другое подмножество
+            for s, row in enumerate(nfa.moves):
+                if any(bits[t] in changed for targets in row.values() for t in targets):
+                    dirty.add(bits[s])
+        for name in old_rows.keys() - rows.keys():
+            self._closures.pop(self._bits[name], None)
+
+        closures = self._closures
+        state_of = {bit: s for s, bit in enumerate(bits)}
+        outputs = nfa.outputs
+        finals = {bits[s] for s, output in enumerate(outputs) if output}
+
+        def output_of(subset):
+            # как в determinize: выход состояния НКА с наименьшим номером
+            found = [state_of[bit] for bit in iter_set(subset) if bit in finals]
+            return outputs[min(found)] if found else ""
+
+        dfa = CompactAutomaton()
+        dfa.symbols = list(nfa.symbols)
+        dfa.symbol_index = dict(nfa.symbol_index)
+        symbol_index = nfa.symbol_index
+
+        old_subsets = self._subsets
+        subsets = {}
+        reused = recomputed = 0
+        start = closures[bits[nfa.start]]
+        subset_ids = {start: dfa.state_id("S0", output_of(start))}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            src = subset_ids[current]
+
+            targets = None
+            if not dirty or dirty.isdisjoint(iter_set(current)):
+                targets = old_subsets.get(current)
+            if targets is None:
+                recomputed += 1
+                parts = {}
+                for bit in iter_set(current):
+                    s = state_of[bit]
+                    for aid, succ in nfa.moves[s].items():
+                        parts.setdefault(nfa.symbols[aid], []).extend(closures[bits[t]] for t in succ)
+                targets = {symbol: union_of(sets) for symbol, sets in parts.items()}
+            else:
+                reused += 1
+            subsets[current] = targets
+
+            # тот же порядок символов, что в determinize
+            for symbol in sorted(targets, key=symbol_index.__getitem__):
+                subset = targets[symbol]
+                dst = subset_ids.get(subset)
+                if dst is None:
+                    dst = dfa.state_id(f"S{len(dfa)}", output_of(subset))
+                    subset_ids[subset] = dst
+                    queue.append(subset)
+                dfa.moves[src][symbol_index[symbol]] = [dst]
+
+        # недостижимые подмножества старой версии больше не нужны
+        self._subsets = subsets
+        self.reused = reused
+        self.recomputed = recomputed
+        metrics.count("incremental.reused", reused)
+        metrics.count("incremental.recomputed", recomputed)
+        return dfa
+
+    def verify(self, nfa, dfa):
+        """Совпадает ли dfa из update с полным перестроением determinize(nfa)."""
+        expected = determinize(nfa)
+        return (dfa.state_names == expected.state_names
+                and dfa.outputs == expected.outputs
+                and dfa.symbols == expected.symbols
+                and dfa.start == expected.start
+                and dfa.moves == expected.moves)
@@ -0,0 +1,193 @@
+import sys
+
+from .charclass import SymbolMap
+from .closure import epsilon_closures, iter_bits, mask_of, union_of
+from .table_io import load_automaton
+
+# переход ещё не построен / ведёт в пустое множество
+_UNKNOWN = None
+_DEAD = -1
+
+
+class LazyDFA:
+    """ДКА, который строится по НКА прямо во время прогона входа.
+
+    Состояние — ε-замкнутое множество состояний НКА в форме (low, mask), как
+    в determinize, но заводится только тогда, когда вход в него попал.
+    Заранее хранятся лишь замыкания в той же форме и маски состояний с
+    переходом по каждому символу, то есть память до прогона линейна по НКА;
+    замыкания целей объединяются, только когда переход ещё не построен.
+    Построенных состояний не больше max_states: при переполнении кэш
+    сбрасывается целиком. Если между сбросами прочитано меньше
+    min_progress символов на состояние, кэш не окупается, и остаток входа
+    прогоняется простой симуляцией НКА по множествам без запоминания.
+    """
+
+    def __init__(self, nfa, max_states=4096, min_progress=10):
+        k = len(nfa.symbols)
+        self.symbol_index = SymbolMap(nfa.symbols, range(k), None)
+        self.max_states = max_states
+        self.min_progress = min_progress
+
+        # movers[a] — маска состояний, у которых вообще есть переход по a
+        self._closures = epsilon_closures(nfa)
+        self._moves = nfa.moves
+        self._movers = [mask_of(s for s, row in enumerate(nfa.moves) if aid in row) for aid in range(k)]
+        self._final_mask = mask_of(s for s, output in enumerate(nfa.outputs) if output)
+        self._start_set = self._closures[nfa.start]
+
+        self.built = 0  # сколько состояний ДКА построено за всё время
+        self.resets = 0
+        self.fallbacks = 0
+        self._reset()
+
+    @classmethod
+    def from_table(cls, filename, **options):
+        return cls(load_automaton(filename), **options)
+
+    def __len__(self):
+        """Сколько состояний ДКА сейчас в кэше."""
+        return len(self._sets)
+
+    def _reset(self):
+        self._sets = []
+        self._index = {}
+        self._next = []
+        self._final = []
+        self._progress = 0
+        self._start = self._state(self._start_set)
+
+    def _state(self, subset):
+        sid = self._index.get(subset)
+        if sid is None:
+            sid = len(self._sets)
+            self._index[subset] = sid
+            self._sets.append(subset)
+            self._next.append({})
+            self._final.append(self._is_final(subset))
+            self.built += 1
+        return sid
+
+    def _is_final(self, subset):
+        low, mask = subset
+        return bool(mask & (self._final_mask >> low))
+
+    def _move(self, subset, aid):
+        """Множество после символа aid; None — все ветви умерли."""
+        low, mask = subset
+        moves = self._moves
+        closures = self._closures
+        result = union_of(closures[t]
+                          for i in iter_bits(mask & (self._movers[aid] >> low))
+                          for t in moves[low + i][aid])
+        return None if result[0] is None else result
+
+    def _simulate(self, subset, text, pos):
+        """Симуляция НКА по множествам с позиции pos; None — все ветви умерли."""
+        index = self.symbol_index
+        move = self._move
+        for i in range(pos, len(text)):
+            aid = index[text[i]]
+            if aid is None:
+                return None
+            subset = move(subset, aid)
+            if subset is None:
+                return None
+        return subset
+
+    def _run(self, state, text):
+        """Прогоняет text из состояния state (номер в кэше или множество НКА).
+
+        Возвращает номер состояния в кэше, _DEAD или, если пришлось
+        перейти на симуляцию НКА, множество в виде кортежа (subset,).
+        """
+        if isinstance(state, tuple):
+            return state if state[0] is None else (self._simulate(state[0], text, 0),)
+
+        index = self.symbol_index
+        nexts = self._next
+        counted = 0  # до какой позиции символы уже учтены в _progress
+        for pos in range(len(text)):
+            aid = index[text[pos]]
+            if aid is None:
+                return _DEAD
+            row = nexts[state]
+            target = row.get(aid, _UNKNOWN)
+            if target is _UNKNOWN:
+                subset = self._move(self._sets[state], aid)
+                if subset is None:
+                    row[aid] = _DEAD
+                    return _DEAD
+                target = self._index.get(subset)
+                if target is None:
+                    if len(self._sets) >= self.max_states:
+                        thrashing = self._progress + pos - counted < self.min_progress * self.max_states
+                        self.resets += 1
+                        self._reset()
+                        counted = pos
+                        if thrashing:
+                            self.fallbacks += 1
+                            return (self._simulate(subset, text, pos + 1),)
+                        nexts = self._next
+                        state = self._state(subset)
+                        continue
+                    target = self._state(subset)
+                row[aid] = target
+            elif target == _DEAD:
+                return _DEAD
+            state = target
+        self._progress += len(text) - counted
+        return state
+
+    def _accepts(self, state):
+        if isinstance(state, tuple):
+            return state[0] is not None and self._is_final(state[0])
+        return state != _DEAD and self._final[state]
+
+    def fullmatch(self, text):
+        """Принят ли вход целиком; text — строка или список имён символов."""
+        return self._accepts(self._run(self._start, text))
+
+    def match_many(self, inputs):
+        """Пакетная проверка: bytearray с 1 для принятых строк."""
+        result = bytearray()
+        for text in inputs:
+            result.append(1 if self.fullmatch(text) else 0)
+        return result
+
+    def fullmatch_stream(self, stream, chunk_size=1 << 16):
+        """Принят ли весь текстовый поток; кэш живёт между кусками."""
+        state = self._start
+        while state != _DEAD:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return self._accepts(state)
+            state = self._run(state, chunk)
+            if isinstance(state, tuple) and state[0] is None:
+                return False
+        return False
+
+    def match_lines(self, file):
+        return self.match_many(line.rstrip('\r\n') for line in file)
+
+
+def main():
+    options = dict(arg[2:].partition('=')[::2] for arg in sys.argv[1:] if arg.startswith('--'))
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+
+    if len(args) != 2:
+        print("Usage: python -m automata.lazy_dfa [--max-states=N] [--stats] nfa.csv input.txt")
+        sys.exit(1)
+
+    max_states = int(options['max-states']) if options.get('max-states') else 4096
+    matcher = LazyDFA.from_table(args[0], max_states=max_states)
+    with open(args[1], 'r', encoding='utf-8') as file:
+        for accepted in matcher.match_lines(file):
+            print("accept" if accepted else "reject")
+    if 'stats' in options:
+        print(f"states built: {matcher.built}, cached: {len(matcher)}, "
+              f"resets: {matcher.resets}, NFA fallbacks: {matcher.fallbacks}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import sys
+from array import array
+
+from .binary_io import MappedAutomaton, has_binary_magic
+from .charclass import SymbolMap
+from .dfa import determinize
+from .table_io import load_automaton
+
+
+def _compact_table(automaton):
+    """(width, table, final, outputs) для детерминированного CompactAutomaton."""
+    n = len(automaton)
+    width = len(automaton.symbols) + 1
+    table = array('l', [-1]) * (n * width)
+    final = bytearray(n)
+    for s in range(n):
+        base = s * width
+        for aid, targets in automaton.moves[s].items():
+            table[base + aid + 1] = targets[0] * width
+        if automaton.outputs[s]:
+            final[s] = 1
+    outputs = {s * width: output for s, output in enumerate(automaton.outputs) if output}
+    return width, table, final, outputs
+
+
+def _mapped_table(mapped):
+    """То же прямо из массивов CSR отображённого .aut; None, если автомат не ДКА."""
+    if len(mapped.eps_dst):
+        return None
+    n = len(mapped)
+    width = len(mapped.symbols) + 1
+    table = array('l', [-1]) * (n * width)
+    final = bytearray(n)
+    move_ptr, move_sym, move_dst = mapped.move_ptr, mapped.move_sym, mapped.move_dst
+    for s in range(n):
+        base = s * width + 1
+        for j in range(move_ptr[s], move_ptr[s + 1]):
+            cell = base + move_sym[j]
+            if table[cell] >= 0:
+                return None
+            table[cell] = move_dst[j] * width
+
+    outputs = {}
+    output_table = mapped.output_table
+    for s, output_id in enumerate(mapped.output_ids):
+        if output_table[output_id]:
+            final[s] = 1
+            outputs[s * width] = output_table[output_id]
+    return width, table, final, outputs
+
+
+class CompiledDFA:
+    """ДКА, разложенный в плоский массив для быстрого прогона строк.
+
+    Столбец 0 — все символы вне алфавита, столбец i + 1 — символ i (или
+    класс символов [..] из lw5).
+    table[s * width + c] хранит уже умноженный на width номер следующего
+    состояния или -1, так что шаг автомата — одно обращение к массиву.
+    final[s] — принимает ли состояние s (индекс — номер без умножения).
+    """
+
+    def __init__(self, automaton):
+        """automaton — CompactAutomaton или MappedAutomaton (.aut без копирования в словари)."""
+        flat = None
+        if isinstance(automaton, MappedAutomaton):
+            flat = _mapped_table(automaton)
+            if flat is None:
+                automaton = automaton.to_compact()
+        if flat is None:
+            if not automaton.is_deterministic():
+                automaton = determinize(automaton)
+            flat = _compact_table(automaton)
+
+        width, self.table, self.final, self.outputs = flat
+        self.width = width
+        self.start = automaton.start * width
+        self.symbols = list(automaton.symbols)
+
+        # незнакомый символ уходит в столбец 0
+        self._char_classes = SymbolMap(self.symbols, range(1, width), 0)
+        self._byte_classes = None
+        if width <= 256:
+            self._byte_classes = bytes(self._char_classes[b] for b in range(256))
+        self._symbol_classes = {symbol: aid + 1 for aid, symbol in enumerate(self.symbols)}
+
+        # множества «живых» состояний для finditer, общие для всех вызовов
+        self._live = [bytes(self.final)]
+        self._live_ids = {self._live[0]: 0}
+        self._live_steps = {}
+
+    @classmethod
+    def from_table(cls, filename):
+        """Загрузка из CSV-таблицы lw4 (или любой другой таблицы Мура) либо из .aut."""
+        if has_binary_magic(filename):
+            with MappedAutomaton(filename) as mapped:
+                return cls(mapped)
+        return cls(load_automaton(filename))
+
+    def column(self, symbol):
+        """Номер столбца символа (0 — символ вне алфавита)."""
+        return self._symbol_classes.get(symbol, 0)
+
+    def classes(self, text):
+        """Переводит вход в последовательность номеров столбцов.
+
+        str и bytes переводятся целиком через translate, списки — как
+        последовательности многосимвольных имён.
+        """
+        if isinstance(text, str):
+            translated = text.translate(self._char_classes)
+            if self.width <= 256:
+                return translated.encode('latin-1')
+            return array('I', translated.encode('utf-32-le'))
+        if isinstance(text, (bytes, bytearray, memoryview)):
+            if self._byte_classes is None:
+                return self.classes(bytes(text).decode('latin-1'))
+            return bytes(text).translate(self._byte_classes)
+        return [self._symbol_classes.get(symbol, 0) for symbol in text]
+
+    def step(self, state, text):
+        """Прогоняет кусок входа из состояния state; -1 — автомат умер."""
+        table = self.table
+        for c in self.classes(text):
+            state = table[state + c]
+            if state < 0:
+                return -1
+        return state
+
+    def fullmatch(self, text):
+        state = self.step(self.start, text)
+        return state >= 0 and bool(self.final[state // self.width])
+
+    def output(self, text):
+        """Выход автомата Мура после всего входа ('' при отказе)."""
+        state = self.step(self.start, text)
+        return self.outputs.get(state, "") if state >= 0 else ""
+
+    def match_many(self, inputs):
+        """Пакетная проверка: bytearray с 1 для принятых строк."""
+        table = self.table
+        final = self.final
+        width = self.width
+        start = self.start
+        classes = self.classes
+        result = bytearray()
+        append = result.append
+        for text in inputs:
+            state = start
+            for c in classes(text):
+                state = table[state + c]
+                if state < 0:
+                    break
+            append(1 if state >= 0 and final[state // width] else 0)
+        return result
+
+    def fullmatch_stream(self, stream, chunk_size=1 << 16):
+        """Принят ли весь поток (файл, открытый в текстовом или двоичном режиме)."""
+        state = self.start
+        while state >= 0:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return bool(self.final[state // self.width])
+            state = self.step(state, chunk)
+        return False
+
+    def _live_before(self, live, c):
+        """Номер множества состояний, из которых символ c ведёт в множество live."""
+        key = live * self.width + c
+        result = self._live_steps.get(key)
+        if result is None:
+            after = self._live[live]
+            table = self.table
+            width = self.width
+            current = bytearray(self.final)
+            for q in range(len(current)):
+                target = table[q * width + c]
+                if target >= 0 and after[target // width]:
+                    current[q] = 1
+            current = bytes(current)
+            result = self._live_ids.get(current)
+            if result is None:
+                result = len(self._live)
+                self._live.append(current)
+                self._live_ids[current] = result
+            self._live_steps[key] = result
+        return result
+
+    def finditer(self, text, outputs=False):
+        """Самые длинные непересекающиеся совпадения слева направо: пары (начало, конец).
+
+        С outputs=True — тройки (начало, конец, выход): для автомата
+        из lw5 --multi выход — номер совпавшего шаблона.
+
+        Сначала проход справа налево отмечает для каждой позиции j «живые»
+        состояния — те, из которых по codes[j:] ещё достижимо принимающее.
+        Прямой прогон обрывается, как только состояние перестаёт быть живым,
+        то есть не заходит дальше конца самого длинного совпадения, и сами
+        прогоны линейны по длине входа. Каждое новое множество живых
+        состояний стоит O(числа состояний), а различных множеств не больше
+        длины входа, так что худший случай всего поиска — O(длина × состояния);
+        множества запоминаются между вызовами, и обычно их немного.
+        """
+        codes = self.classes(text)
+        table = self.table
+        final = self.final
+        width = self.width
+        n = len(codes)
+
+        live_sets = self._live
+        steps = self._live_steps
+        live = array('l', [0]) * (n + 1)
+        current = 0
+        for j in range(n - 1, -1, -1):
+            c = codes[j]
+            following = steps.get(current * width + c)
+            current = self._live_before(current, c) if following is None else following
+            live[j] = current
+
+        start = self.start
+        start_id = start // width
+        i = 0
+        while i < n:
+            if not live_sets[live[i]][start_id]:
+                i += 1
+                continue
+            state = start
+            end = -1
+            end_state = -1
+            j = i
+            while j < n:
+                state = table[state + codes[j]]
+                if state < 0:
+                    break
+                j += 1
+                q = state // width
+                if final[q]:
+                    end = j
+                    end_state = state
+                elif not live_sets[live[j]][q]:
+                    break
+            if end > i:
+                yield (i, end, self.outputs[end_state]) if outputs else (i, end)
+                i = end
+            else:
+                i += 1
+
+    def search(self, text):
+        return next(self.finditer(text), None)
+
+    def match_lines(self, file):
+        """Для каждой строки файла — принята ли она целиком (без перевода строки)."""
+        return self.match_many(line.rstrip('\r\n') for line in file)
+
+    def output_lines(self, file):
+        """Для каждой строки файла — выход после неё целиком ('' при отказе)."""
+        return (self.output(line.rstrip('\r\n')) for line in file)
+
+
+def main():
+    flags = {arg for arg in sys.argv[1:] if arg in ('--spans', '--ids')}
+    args = [arg for arg in sys.argv[1:] if arg not in flags]
+
+    if len(args) != 2:
+        print("Usage: python -m automata.matcher [--spans] [--ids] dfa.csv|dfa.aut input.txt")
+        sys.exit(1)
+
+    # --ids: вместо accept печатается выход состояния (номер шаблона для lw5 --multi)
+    ids = '--ids' in flags
+    matcher = CompiledDFA.from_table(args[0])
+    with open(args[1], 'r', encoding='utf-8') as file:
+        if '--spans' in flags:
+            for number, line in enumerate(file, 1):
+                for match in matcher.finditer(line.rstrip('\r\n'), outputs=ids):
+                    print(f"{number}:" + ":".join(str(value) for value in match))
+        elif ids:
+            for output in matcher.output_lines(file):
+                print(output or "reject")
+        else:
+            for accepted in matcher.match_lines(file):
+                print("accept" if accepted else "reject")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Общие счётчики, таймеры, отладочный вывод и профилирование для lw3–lw6.
+
+Пока сбор выключен, count/observe сводятся к проверке одного флага, а в
+горячих циклах вызывающий код сам проверяет ENABLED один раз до цикла.
+Инструменты включают всё это общими флагами через run(main):
+--metrics[=FILE] — JSON-отчёт (без FILE — в stderr), --profile[=FILE] —
+cProfile (FILE.prof — сырые данные, иначе текстовая сводка), --trace —
+отладочный вывод trace().
+"""
+import cProfile
+import functools
+import json
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+ENABLED = False
+TRACE = False
+
+_counters = {}
+_observations = {}  # имя -> [число, сумма, минимум, максимум]
+_timers = {}  # имя -> [вызовы, секунды]
+_gauges = {}
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    _counters.clear()
+    _observations.clear()
+    _timers.clear()
+    _gauges.clear()
+
+
+def count(name, value=1):
+    if ENABLED:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, value):
+    """Одно наблюдение величины (размер замыкания, длина очереди, ...)."""
+    if ENABLED:
+        entry = _observations.get(name)
+        if entry is None:
+            _observations[name] = [1, value, value, value]
+        else:
+            entry[0] += 1
+            entry[1] += value
+            if value < entry[2]:
+                entry[2] = value
+            if value > entry[3]:
+                entry[3] = value
+
+
+def gauge(name, value):
+    """Последнее значение величины (скорость, размер результата)."""
+    if ENABLED:
+        _gauges[name] = value
+
+
+@contextmanager
+def timer(name):
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = _timers.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += time.perf_counter() - started
+
+
+def timed(name):
+    """Декоратор: время всех вызовов функции идёт в таймер name."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def counter(name):
+    return _counters.get(name, 0)
+
+
+def elapsed(name):
+    """Сколько секунд всего набрал таймер name (0, если не запускался)."""
+    return _timers.get(name, (0, 0.0))[1]
+
+
+def trace(*values):
+    """Отладочный вывод в stderr, только с --trace."""
+    if TRACE:
+        print(*values, file=sys.stderr)
+
+
+def report():
+    return {
+        "counters": dict(_counters),
+        "observations": {
+            name: {"count": n, "sum": total, "min": low, "max": high, "mean": total / n}
+            for name, (n, total, low, high) in _observations.items()
+        },
+        "timers": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in _timers.items()},
+        "gauges": dict(_gauges),
+    }
+
+
+def write_report(target="-"):
+    text = json.dumps(report(), indent=1, ensure_ascii=False)
+    if target == "-":
+        print(text, file=sys.stderr)
+    else:
+        with open(target, 'w', encoding='utf-8') as file:
+            file.write(text + "\n")
+
+
+def profile(function, *args, output="-", sort="cumulative", limit=30, **kwargs):
+    """Вызывает function под cProfile и сохраняет или печатает статистику."""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        if output.endswith('.prof'):
+            profiler.dump_stats(output)
+        elif output == "-":
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats(sort).print_stats(limit)
+        else:
+            with open(output, 'w', encoding='utf-8') as file:
+                pstats.Stats(profiler, stream=file).sort_stats(sort).print_stats(limit)
+
+
+def run(main):
+    """Запускает main() инструмента, сняв с sys.argv общие флаги --metrics, --profile и --trace."""
+    global TRACE
+    report_target = None
+    profile_target = None
+    argv = [sys.argv[0]]
+    for arg in sys.argv[1:]:
+        name, _, value = arg.partition('=')
+        if name == '--metrics':
+            report_target = value or "-"
+        elif name == '--profile':
+            profile_target = value or "-"
+        elif arg == '--trace':
+            TRACE = True
+        else:
+            argv.append(arg)
+    sys.argv = argv
+
+    if report_target is not None:
+        enable()
+    try:
+        with timer("total"):
+            if profile_target is not None:
+                profile(main, output=profile_target)
+            else:
+                main()
+    finally:
+        if report_target is not None:
+            write_report(report_target)
@@ -0,0 +1,133 @@
+from collections import deque
+
+from . import metrics
+from .nfa import CompactAutomaton
+
+
+def reachable_states(automaton):
+    """id состояний, достижимых из стартового, в порядке обхода в ширину."""
+    seen = [False] * len(automaton)
+    seen[automaton.start] = True
+    order = [automaton.start]
+    queue = deque(order)
+    while queue:
+        s = queue.popleft()
+        for targets in list(automaton.moves[s].values()) + [automaton.eps[s]]:
+            for t in targets:
+                if not seen[t]:
+                    seen[t] = True
+                    order.append(t)
+                    queue.append(t)
+    return order
+
+
+def remove_unreachable_states(automaton):
+    """Копия автомата без недостижимых состояний; имена и порядок столбцов сохраняются."""
+    keep = sorted(reachable_states(automaton))
+    result = CompactAutomaton()
+    result.symbols = list(automaton.symbols)
+    result.symbol_index = dict(automaton.symbol_index)
+    for s in keep:
+        result.state_id(automaton.state_names[s], automaton.outputs[s])
+    remap = result.state_index
+    names = automaton.state_names
+    for s in keep:
+        src = remap[names[s]]
+        for aid, targets in automaton.moves[s].items():
+            result.moves[src][aid] = [remap[names[t]] for t in targets]
+        result.eps[src] = [remap[names[t]] for t in automaton.eps[s]]
+    result.start = remap[names[automaton.start]]
+    return result
+
+
+@metrics.timed("minimize")
+def minimize(dfa):
+    """Минимизация ДКА Мура разбиением Хопкрофта, O(n·k·log n).
+
+    Недостижимые состояния отбрасываются заранее. Отсутствующие переходы ведут
+    в неявное тупиковое состояние; его класс (вместе с эквивалентными ему
+    тупиковыми состояниями) в результат не попадает.
+    """
+    if not dfa.is_deterministic():
+        raise ValueError("minimize expects a deterministic automaton")
+
+    dfa = remove_unreachable_states(dfa)
+    n = len(dfa)
+    k = len(dfa.symbols)
+    sink = n
+
+    # обратные переходы: inverse[a][t] — состояния, из которых по a попадаем в t
+    inverse = [{} for _ in range(k)]
+    for s in range(n):
+        row = dfa.moves[s]
+        for a in range(k):
+            targets = row.get(a)
+            inverse[a].setdefault(targets[0] if targets else sink, []).append(s)
+    for a in range(k):
+        inverse[a].setdefault(sink, []).append(sink)
+
+    by_output = {}
+    for s in range(n):
+        by_output.setdefault(dfa.outputs[s], []).append(s)
+    by_output.setdefault("", []).append(sink)
+
+    blocks = []
+    block_of = [0] * (n + 1)
+    for members in by_output.values():
+        for s in members:
+            block_of[s] = len(blocks)
+        blocks.append(set(members))
+
+    largest = max(range(len(blocks)), key=lambda b: len(blocks[b]))
+    pending = set(b for b in range(len(blocks)) if b != largest)
+
+    while pending:
+        splitter = list(blocks[pending.pop()])
+        for a in range(k):
+            predecessors = inverse[a]
+            touched = {}
+            for t in splitter:
+                for s in predecessors.get(t, ()):
+                    touched.setdefault(block_of[s], []).append(s)
+
+            for b, states in touched.items():
+                block = blocks[b]
+                if len(states) == len(block):
+                    continue
+                new_b = len(blocks)
+                new_block = set(states)
+                block -= new_block
+                blocks.append(new_block)
+                for s in states:
+                    block_of[s] = new_b
+                if b in pending or len(new_block) <= len(block):
+                    pending.add(new_b)
+                else:
+                    pending.add(b)
+
+    dead = block_of[sink]
+    result = CompactAutomaton()
+    result.symbols = list(dfa.symbols)
+    result.symbol_index = dict(dfa.symbol_index)
+
+    start_block = block_of[dfa.start]
+    new_id = {start_block: result.state_id("S0", dfa.outputs[dfa.start])}
+    queue = deque([start_block] if start_block != dead else [])
+    while queue:
+        b = queue.popleft()
+        representative = min(blocks[b])
+        src = new_id[b]
+        for a, targets in sorted(dfa.moves[representative].items()):
+            target_block = block_of[targets[0]]
+            if target_block == dead:
+                continue
+            dst = new_id.get(target_block)
+            if dst is None:
+                dst = result.state_id(f"S{len(result)}", dfa.outputs[min(blocks[target_block])])
+                new_id[target_block] = dst
+                queue.append(target_block)
+            result.moves[src][a] = [dst]
+
+    metrics.count("minimize.dfa_states", n)
+    metrics.count("minimize.min_states", len(result))
+    return result
@@ -0,0 +1,114 @@
+EPSILON = "ε"
+
+
+class CompactAutomaton:
+    """Автомат Мура, в котором состояния и символы пронумерованы подряд с нуля.
+
+    moves[s] — словарь {id символа: [id следующих состояний]},
+    eps[s] — список ε-переходов состояния s.
+    """
+
+    def __init__(self):
+        self.state_names = []
+        self.state_index = {}
+        self.outputs = []
+        self.symbols = []
+        self.symbol_index = {}
+        self.moves = []
+        self.eps = []
+        self.start = 0
+
+    def __len__(self):
+        return len(self.state_names)
+
+    def state_id(self, name, output=None):
+        """Возвращает id состояния, при необходимости заводя новое."""
+        sid = self.state_index.get(name)
+        if sid is None:
+            sid = len(self.state_names)
+            self.state_index[name] = sid
+            self.state_names.append(name)
+            self.outputs.append("")
+            self.moves.append({})
+            self.eps.append([])
+        if output is not None:
+            self.outputs[sid] = output
+        return sid
+
+    def symbol_id(self, symbol):
+        aid = self.symbol_index.get(symbol)
+        if aid is None:
+            aid = len(self.symbols)
+            self.symbol_index[symbol] = aid
+            self.symbols.append(symbol)
+        return aid
+
+    def add_move(self, src, aid, dst):
+        """Переход по id символа между id состояний."""
+        targets = self.moves[src].get(aid)
+        if targets is None:
+            self.moves[src][aid] = [dst]
+        elif dst not in targets:
+            targets.append(dst)
+
+    def add_transition(self, src, symbol, dst):
+        """Переход по имени символа; ε уходит в отдельный список."""
+        if symbol == EPSILON:
+            if dst not in self.eps[src]:
+                self.eps[src].append(dst)
+        else:
+            self.add_move(src, self.symbol_id(symbol), dst)
+
+    def is_deterministic(self):
+        if any(self.eps):
+            return False
+        return all(len(targets) == 1 for row in self.moves for targets in row.values())
+
+    @classmethod
+    def from_moore(cls, moore_automaton, alphabet=None):
+        """Строит автомат из словаря {имя: {'output', 'transitions'}}; первое состояние — стартовое."""
+        automaton = cls()
+        allowed = None if alphabet is None else set(alphabet) | {EPSILON}
+        for name, state in moore_automaton.items():
+            automaton.state_id(name, state['output'])
+        for name, state in moore_automaton.items():
+            src = automaton.state_index[name]
+            for transition in state['transitions']:
+                symbol = transition['inputSym']
+                if allowed is not None and symbol not in allowed:
+                    continue
+                next_pos = transition['nextPos']
+                if isinstance(next_pos, str):
+                    next_pos = next_pos.split(',') if next_pos else []
+                if not next_pos and symbol != EPSILON:
+                    automaton.symbol_id(symbol)
+                for next_name in next_pos:
+                    automaton.add_transition(src, symbol, automaton.state_id(next_name))
+        return automaton
+
+    @classmethod
+    def from_moore_list(cls, states):
+        """То же для списка [{'state', 'output', 'transitions'}]."""
+        return cls.from_moore({state['state']: state for state in states})
+
+    def to_moore_list(self):
+        """Обратное преобразование в список состояний с nextPos-строками."""
+        result = []
+        for sid, name in enumerate(self.state_names):
+            transitions = []
+            for aid, targets in self.moves[sid].items():
+                transitions.append({
+                    'inputSym': self.symbols[aid],
+                    'nextPos': ','.join(self.state_names[t] for t in targets)
+                })
+            if self.eps[sid]:
+                transitions.append({
+                    'inputSym': EPSILON,
+                    'nextPos': ','.join(self.state_names[t] for t in self.eps[sid])
+                })
+            result.append({
+                "state": name,
+                "output": self.outputs[sid],
+                "transitions": transitions
+            })
+        return result
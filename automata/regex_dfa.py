@@ -0,0 +1,185 @@
+from collections import deque
+
+from . import metrics
+from .closure import iter_set
+from .nfa import EPSILON, CompactAutomaton
+
+
+def literal(value):
+    return {"type": "Literal", "value": value}
+
+
+def concat(nodes):
+    """Конкатенация списка узлов, вложенная вправо, как в parse_regex."""
+    tree = nodes[-1]
+    for node in reversed(nodes[:-1]):
+        tree = {"type": "Concat", "left": node, "right": tree}
+    return tree
+
+
+def union(nodes):
+    tree = nodes[-1]
+    for node in reversed(nodes[:-1]):
+        tree = {"type": "Or", "left": node, "right": tree}
+    return tree
+
+
+def repeat(node):
+    return {"type": "Repeat", "expr": node}
+
+
+def plus(node):
+    return {"type": "Plus", "expr": node}
+
+
+def _join(a, b):
+    """Объединение множеств позиций (low, mask); None — пустое множество."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a[0] <= b[0]:
+        return a[0], a[1] | b[1] << (b[0] - a[0])
+    return b[0], b[1] | a[1] << (a[0] - b[0])
+
+
+def _members(positions):
+    # у большинства множеств одна позиция: без генератора iter_set
+    if positions[1] == 1:
+        return (positions[0],)
+    return iter_set(positions)
+
+
+def _positions(tree, symbols, follow):
+    """Обход дерева parse_regex в обратном порядке без рекурсии.
+
+    Новые позиции дописываются в symbols/follow (symbols[p] — символ позиции p,
+    follow[p] — followpos). Множества позиций хранятся в форме (low, mask)
+    из closure, пустое — None, так что у длинного выражения они занимают
+    память по разбросу позиций, а не по их числу.
+    Возвращает (firstpos, lastpos, nullable) корня.
+    """
+    # результаты детей лежат на стеке значений, поэтому одно и то же поддерево
+    # может входить в дерево несколько раз и каждый раз получит свои позиции
+    values = []  # (nullable, firstpos, lastpos)
+
+    stack = [(tree, False)]
+    while stack:
+        node, done = stack.pop()
+        kind = node['type']
+        if not done:
+            stack.append((node, True))
+            if kind in ('Concat', 'Or'):
+                stack.append((node['right'], False))
+                stack.append((node['left'], False))
+            elif kind in ('Repeat', 'Plus'):
+                stack.append((node['expr'], False))
+            continue
+
+        if kind == 'Literal':
+            if node['value'] == EPSILON:
+                values.append((True, None, None))
+            else:
+                p = len(symbols)
+                symbols.append(node['value'])
+                follow.append(None)
+                values.append((False, (p, 1), (p, 1)))
+        elif kind == 'Concat':
+            rn, rf, rl = values.pop()
+            ln, lf, ll = values.pop()
+            if ll is not None:
+                for p in _members(ll):
+                    follow[p] = _join(follow[p], rf)
+            values.append((ln and rn, _join(lf, rf) if ln else lf, _join(ll, rl) if rn else rl))
+        elif kind == 'Or':
+            rn, rf, rl = values.pop()
+            ln, lf, ll = values.pop()
+            values.append((ln or rn, _join(lf, rf), _join(ll, rl)))
+        elif kind in ('Repeat', 'Plus'):
+            sn, sf, sl = values.pop()
+            if sl is not None:
+                for p in _members(sl):
+                    follow[p] = _join(follow[p], sf)
+            values.append((True if kind == 'Repeat' else sn, sf, sl))
+        else:
+            raise ValueError(f"Unknown node type '{kind}'")
+
+    nullable, first, last = values.pop()
+    return first, last, nullable
+
+
+@metrics.timed("rules_to_dfa")
+def rules_to_dfa(rules):
+    """ДКА сразу для нескольких выражений; rules — список пар (дерево, выход).
+
+    Каждому правилу приписывается свой концевой маркер. Если в состоянии ДКА
+    заканчиваются несколько правил, выходом становится выход более раннего.
+    Состояние ДКА — множество позиций (low, mask), как подмножества в determinize.
+    """
+    symbols = []
+    follow = []
+    outputs = {}  # позиция концевого маркера -> выход правила
+    first = None
+
+    for tree, output in rules:
+        rule_first, rule_last, nullable = _positions(tree, symbols, follow)
+        end = (len(symbols), 1)
+        outputs[len(symbols)] = output
+        symbols.append(None)
+        follow.append(None)
+        if rule_last is not None:
+            for p in _members(rule_last):
+                follow[p] = _join(follow[p], end)
+        if nullable:
+            rule_first = _join(rule_first, end)
+        first = _join(first, rule_first)
+
+    dfa = CompactAutomaton()
+    position_symbol = [None if symbol is None else dfa.symbol_id(symbol) for symbol in symbols]
+
+    def output_of(subset):
+        # маркеры правил идут по возрастанию позиций: первый — более раннее правило
+        for p in _members(subset):
+            if symbols[p] is None:
+                return outputs[p]
+        return ""
+
+    if first is None:
+        # пустой язык без единой позиции: одно непринимающее состояние
+        dfa.state_id("S0", "")
+        return dfa
+
+    subset_ids = {first: dfa.state_id("S0", output_of(first))}
+    queue = deque([first])
+    while queue:
+        subset = queue.popleft()
+        src = subset_ids[subset]
+
+        targets = {}
+        for p in _members(subset):
+            # у концевых маркеров нет ни символа, ни followpos
+            if follow[p] is not None:
+                aid = position_symbol[p]
+                targets[aid] = _join(targets.get(aid), follow[p])
+
+        for aid in sorted(targets):
+            target = targets[aid]
+            dst = subset_ids.get(target)
+            if dst is None:
+                dst = dfa.state_id(f"S{len(dfa)}", output_of(target))
+                subset_ids[target] = dst
+                queue.append(target)
+            dfa.moves[src][aid] = [dst]
+
+    metrics.count("rules_to_dfa.positions", len(symbols))
+    metrics.count("rules_to_dfa.dfa_states", len(dfa))
+    return dfa
+
+
+def regex_to_dfa(tree):
+    """ДКА прямо по дереву регулярного выражения (позиционный автомат, followpos).
+
+    Вместо ε-переходов Томпсона состояние ДКА — множество позиций литералов,
+    к выражению неявно приписывается концевой маркер #.
+    """
+    return rules_to_dfa([(tree, "F")])
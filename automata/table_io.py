@@ -0,0 +1,291 @@
+import io
+import re
+from array import array
+from contextlib import nullcontext
+
+from . import metrics
+from .binary_io import has_binary_magic, is_binary, read_binary, write_binary
+from .nfa import EPSILON, CompactAutomaton
+
+# Сколько символов текста читается или копится перед записью за раз.
+# При чтении кроме автомата в памяти держится не больше одного такого куска
+# и одной ячейки; при записи к ним добавляется индекс по 4 байта на клетку.
+CHUNK_SIZE = 1 << 16
+
+# ε в битой кодировке из старых таблиц: lw4 всегда пропускал такую строку
+_SKIPPED_SYMBOLS = {"Оµ"}
+
+_CELL_END = re.compile(r'[;\r\n]')
+_NEEDS_QUOTES = re.compile(r'[;"\r\n]')
+
+
+def iter_cells(file, chunk_size=CHUNK_SIZE):
+    """Потоково разбирает таблицу с разделителем ';' на пары (номер строки, ячейка).
+
+    Файл читается кусками по chunk_size символов, строки целиком не собираются,
+    поэтому ширина таблицы не влияет на расход памяти. Кавычки понимаются так же,
+    как их пишет csv.writer.
+    """
+    buf = ""
+    pos = 0
+    row = 0
+    eof = False
+    skip_lf = False
+
+    def read():
+        chunk = file.read(chunk_size)
+        metrics.count("csv.chars_read", len(chunk))
+        return chunk
+
+    while True:
+        if pos >= len(buf):
+            if eof:
+                return
+            buf = read()
+            pos = 0
+            if not buf:
+                return
+
+        if skip_lf:
+            skip_lf = False
+            if buf[pos] == '\n':
+                pos += 1
+                continue
+
+        if buf[pos] == '"':
+            parts = []
+            pos += 1
+            while True:
+                end = buf.find('"', pos)
+                if end == -1 or end == len(buf) - 1:
+                    if not eof:
+                        more = read()
+                        if more:
+                            buf = buf[pos:] + more
+                            pos = 0
+                            continue
+                        eof = True
+                    if end == -1:
+                        raise ValueError(f"Unclosed quoted cell in row {row}")
+                if end + 1 < len(buf) and buf[end + 1] == '"':
+                    parts.append(buf[pos:end + 1])
+                    pos = end + 2
+                    continue
+                parts.append(buf[pos:end])
+                pos = end + 1
+                break
+            cell = "".join(parts)
+            if pos >= len(buf) and not eof:
+                buf = read()
+                pos = 0
+                eof = not buf
+            if pos < len(buf):
+                sep = buf[pos]
+                pos += 1
+            else:
+                sep = '\n'
+        else:
+            match = _CELL_END.search(buf, pos)
+            if match is None:
+                if not eof:
+                    more = read()
+                    if more:
+                        buf = buf[pos:] + more
+                        pos = 0
+                        continue
+                    eof = True
+                cell = buf[pos:]
+                pos = len(buf)
+                sep = '\n'
+            else:
+                end = match.start()
+                cell = buf[pos:end]
+                sep = buf[end]
+                pos = end + 1
+
+        yield row, cell
+        if sep != ';':
+            row += 1
+            skip_lf = sep == '\r'
+
+
+@metrics.timed("csv.read")
+def read_moore_table(file, chunk_size=CHUNK_SIZE):
+    """Читает таблицу автомата Мура прямо в CompactAutomaton.
+
+    Первая строка — выходы, вторая — имена состояний, далее по строке на символ.
+    Стартовым считается первое состояние.
+    """
+    automaton = CompactAutomaton()
+    outputs = []
+    columns = []
+    column = 0
+    symbol = None
+    current_row = -1
+
+    for row, cell in iter_cells(file, chunk_size):
+        if row != current_row:
+            current_row = row
+            column = 0
+        else:
+            column += 1
+
+        if row == 0:
+            if column:
+                outputs.append(cell)
+        elif row == 1:
+            if column:
+                output = outputs[column - 1] if column <= len(outputs) else ""
+                columns.append(automaton.state_id(cell, output))
+        elif column == 0:
+            symbol = cell
+            if symbol and symbol != EPSILON and symbol not in _SKIPPED_SYMBOLS:
+                automaton.symbol_id(symbol)
+        elif cell and symbol not in _SKIPPED_SYMBOLS and column <= len(columns):
+            src = columns[column - 1]
+            for next_name in cell.split(','):
+                automaton.add_transition(src, symbol, automaton.state_id(next_name))
+
+    return automaton
+
+
+def _quote(cell):
+    if _NEEDS_QUOTES.search(cell):
+        return '"' + cell.replace('"', '""') + '"'
+    return cell
+
+
+@metrics.timed("csv.write")
+def write_moore_table(automaton, filename, chunk_size=CHUNK_SIZE):
+    """Записывает автомат в таблицу за один проход по переходам.
+
+    Сначала строится индекс символ -> array номеров непустых столбцов (4 байта
+    на клетку), затем строки выводятся кусками не длиннее chunk_size, а текст
+    каждой ячейки собирается из переходов автомата только в момент вывода.
+    Размер индекса и самого большого куска попадает в метрики csv.index_bytes
+    и csv.max_chunk_chars. Стартовое состояние идёт первым столбцом, символы
+    сортируются, как и раньше во всех лабораторных. Вместо имени можно
+    передать уже открытый текстовый файл.
+    """
+    order = [automaton.start] + [s for s in range(len(automaton)) if s != automaton.start]
+    names = automaton.state_names
+    moves = automaton.moves
+
+    eps_id = len(automaton.symbols)
+    by_symbol = {aid: array('I') for aid in range(len(automaton.symbols))}
+    for column, sid in enumerate(order):
+        for aid in moves[sid]:
+            by_symbol[aid].append(column)
+        if automaton.eps[sid]:
+            by_symbol.setdefault(eps_id, array('I')).append(column)
+    if metrics.ENABLED:
+        metrics.gauge("csv.index_bytes", sum(len(columns) * columns.itemsize for columns in by_symbol.values()))
+
+    def label(aid):
+        return EPSILON if aid == eps_id else automaton.symbols[aid]
+
+    if isinstance(filename, str):
+        target = open(filename, mode='w', newline='', encoding='utf-8')
+    else:
+        target = nullcontext(filename)
+    with target as file:
+        out = []
+        size = 0
+        max_chunk = 0
+
+        def emit(text):
+            nonlocal size, max_chunk
+            out.append(text)
+            size += len(text)
+            if size >= chunk_size:
+                metrics.count("csv.chars_written", size)
+                max_chunk = max(max_chunk, size)
+                file.write("".join(out))
+                out.clear()
+                size = 0
+
+        def sparse_cells(aid, columns):
+            # columns уже упорядочены по возрастанию
+            columns = iter(columns)
+            filled = next(columns, None)
+            for column in range(len(order)):
+                if filled == column:
+                    sid = order[column]
+                    targets = automaton.eps[sid] if aid == eps_id else moves[sid][aid]
+                    yield ','.join(names[t] for t in targets)
+                    filled = next(columns, None)
+                else:
+                    yield ''
+
+        def emit_row(first, cells):
+            emit(_quote(first))
+            for cell in cells:
+                emit(';' + _quote(cell) if cell else ';')
+            emit('\r\n')
+
+        emit_row('', (automaton.outputs[sid] for sid in order))
+        emit_row('', (names[sid] for sid in order))
+
+        for aid in sorted(by_symbol, key=label):
+            emit_row(label(aid), sparse_cells(aid, by_symbol[aid]))
+            by_symbol[aid] = None
+
+        metrics.count("csv.chars_written", size)
+        metrics.gauge("csv.max_chunk_chars", max(max_chunk, size))
+        file.write("".join(out))
+
+
+def table_order(automaton):
+    """Тот же автомат в нумерации, которая получилась бы после записи в таблицу и чтения.
+
+    Стартовое состояние становится первым, символы нумеруются по алфавиту.
+    Нужна, чтобы цепочка стадий в памяти давала те же имена состояний ДКА,
+    что и цепочка лабораторных через файлы.
+    """
+    order = [automaton.start] + [s for s in range(len(automaton)) if s != automaton.start]
+    names = automaton.state_names
+    result = CompactAutomaton()
+    for symbol in sorted(automaton.symbols):
+        result.symbol_id(symbol)
+    for sid in order:
+        result.state_id(names[sid], automaton.outputs[sid])
+
+    remap = [0] * len(automaton)
+    for new, sid in enumerate(order):
+        remap[sid] = new
+    symbol_remap = [result.symbol_index[symbol] for symbol in automaton.symbols]
+    for new, sid in enumerate(order):
+        row = automaton.moves[sid]
+        result.moves[new] = {symbol_remap[aid]: [remap[t] for t in row[aid]]
+                             for aid in sorted(row, key=symbol_remap.__getitem__)}
+        result.eps[new] = [remap[t] for t in automaton.eps[sid]]
+    result.start = 0
+    return result
+
+
+def load_automaton(filename):
+    """Читает автомат из двоичного файла (по сигнатуре) или из CSV-таблицы."""
+    if has_binary_magic(filename):
+        return read_binary(filename)
+    with open(filename, 'r', encoding='utf-8') as file:
+        return read_moore_table(file)
+
+
+def dump_automaton(automaton, binary=False):
+    """Содержимое файла автомата в байтах: .aut или CSV в UTF-8."""
+    if binary:
+        buffer = io.BytesIO()
+        write_binary(automaton, buffer)
+        return buffer.getvalue()
+    buffer = io.StringIO()
+    write_moore_table(automaton, buffer)
+    return buffer.getvalue().encode('utf-8')
+
+
+def save_automaton(automaton, filename):
+    """Пишет автомат в двоичный формат, если имя кончается на .aut, иначе в CSV."""
+    if is_binary(filename):
+        write_binary(automaton, filename)
+    else:
+        write_moore_table(automaton, filename)
+
@@ -0,0 +1,139 @@
+from . import metrics
+from .nfa import CompactAutomaton
+
+
+@metrics.timed("thompson_nfa")
+def thompson_nfa(tree, keys=None, fragments=None):
+    """НКА Томпсона по дереву parse_regex без рекурсии.
+
+    Состояния называются q1, q2, ... в порядке рекурсивного построения
+    Томпсона: левое поддерево, правое, затем свои старт и финал. Если переданы
+    keys ({id(узла): ключ}, см. cache.tree_keys), одинаковые поддеревья
+    строятся один раз, а дальше копируются со сдвигом номеров. fragments(ключ)
+    может вернуть уже готовый НКА поддерева (например, из кэша) или None.
+    """
+    nfa = CompactAutomaton()
+    built = {}  # ключ -> (первое состояние, последнее + 1, старт, финал)
+    values = []  # (старт, финал) готовых поддеревьев
+
+    def new_state():
+        return nfa.state_id(f"q{len(nfa) + 1}")
+
+    def copy_range(lo, hi, start, final):
+        # у готового фрагмента исходящих переходов нет только у финала,
+        # остальные переходы его состояний — внутренние
+        shift = len(nfa) - lo
+        for s in range(lo, hi):
+            new_state()
+        for s in range(lo, hi):
+            if s == final:
+                continue
+            for aid, targets in nfa.moves[s].items():
+                nfa.moves[s + shift][aid] = [t + shift for t in targets]
+            nfa.eps[s + shift] = [t + shift for t in nfa.eps[s]]
+        return start + shift, final + shift
+
+    def copy_automaton(fragment):
+        shift = len(nfa)
+        final = fragment.outputs.index("F")
+        for s in range(len(fragment)):
+            new_state()
+        for s in range(len(fragment)):
+            for aid, targets in fragment.moves[s].items():
+                aid = nfa.symbol_id(fragment.symbols[aid])
+                nfa.moves[s + shift][aid] = [t + shift for t in targets]
+            nfa.eps[s + shift] = [t + shift for t in fragment.eps[s]]
+        return fragment.start + shift, final + shift
+
+    stack = [(tree, False)]
+    while stack:
+        node, done = stack.pop()
+        key = keys[id(node)] if keys is not None else None
+
+        if not done:
+            if key is not None:
+                if key in built:
+                    values.append(copy_range(*built[key]))
+                    continue
+                fragment = fragments(key) if fragments is not None else None
+                if fragment is not None:
+                    lo = len(nfa)
+                    values.append(copy_automaton(fragment))
+                    built[key] = (lo, len(nfa)) + values[-1]
+                    continue
+            stack.append((node, True))
+            kind = node['type']
+            if kind in ('Concat', 'Or'):
+                stack.append((node['right'], False))
+                stack.append((node['left'], False))
+            elif kind in ('Repeat', 'Plus'):
+                stack.append((node['expr'], False))
+            # начало диапазона состояний поддерева
+            values.append(len(nfa))
+            continue
+
+        kind = node['type']
+        if kind == 'Literal':
+            start = new_state()
+            final = new_state()
+            nfa.add_transition(start, node['value'], final)
+        elif kind == 'Concat':
+            rstart, rfinal = values.pop()
+            lstart, lfinal = values.pop()
+            nfa.eps[lfinal].append(rstart)
+            start, final = lstart, rfinal
+        elif kind == 'Or':
+            rstart, rfinal = values.pop()
+            lstart, lfinal = values.pop()
+            start = new_state()
+            final = new_state()
+            nfa.eps[start].append(lstart)
+            nfa.eps[lfinal].append(final)
+            nfa.eps[start].append(rstart)
+            nfa.eps[rfinal].append(final)
+        elif kind in ('Repeat', 'Plus'):
+            sub_start, sub_final = values.pop()
+            start = new_state()
+            final = new_state()
+            nfa.eps[start].append(sub_start)
+            nfa.eps[sub_final].append(sub_start)
+            nfa.eps[sub_final].append(final)
+            if kind == 'Repeat':
+                nfa.eps[start].append(final)
+        else:
+            raise ValueError(f"Unknown node type '{kind}'")
+
+        lo = values.pop()
+        values.append((start, final))
+        if key is not None:
+            built[key] = (lo, len(nfa), start, final)
+
+    start, final = values.pop()
+    nfa.start = start
+    nfa.outputs[final] = "F"
+    metrics.count("thompson_nfa.states", len(nfa))
+    return nfa
+
+
+def union_nfa(rules):
+    """Общий НКА для списка пар (дерево, выход) с одним стартовым состоянием.
+
+    Старт q0 ведёт по ε в НКА Томпсона каждого правила, финал правила
+    получает его выход вместо "F". Состояния правил идут подряд в порядке
+    списка, поэтому determinize при совпадении отдаёт выход более раннего.
+    """
+    nfa = CompactAutomaton()
+    start = nfa.state_id("q0")
+    for tree, output in rules:
+        fragment = thompson_nfa(tree)
+        shift = len(nfa)
+        for s in range(len(fragment)):
+            nfa.state_id(f"q{shift + s}", output if fragment.outputs[s] else "")
+        for s in range(len(fragment)):
+            for aid, targets in fragment.moves[s].items():
+                aid = nfa.symbol_id(fragment.symbols[aid])
+                nfa.moves[s + shift][aid] = [t + shift for t in targets]
+            nfa.eps[s + shift] = [t + shift for t in fragment.eps[s]]
+        nfa.eps[start].append(fragment.start + shift)
+    nfa.start = start
+    return nfa
@@ -0,0 +1,145 @@
+"""Генераторы синтетических входов для бенчмарков lw3–lw6."""
+import random
+import string
+
+from automata import CompactAutomaton
+
+
+def right_grammar(nonterminals, terminals="abcdefgh", rules=3, seed=0):
+    """Праволинейная грамматика: <N> -> a <M> | ... | b (вход lw3)."""
+    rng = random.Random(seed)
+    names = ["S"] + [f"N{i}" for i in range(1, nonterminals)]
+    lines = []
+    for name in names:
+        parts = [f"{rng.choice(terminals)} <{rng.choice(names)}>" for _ in range(rules)]
+        parts.append(rng.choice(terminals))
+        lines.append(f"<{name}> -> " + " | ".join(parts))
+    return "\n".join(lines) + "\n"
+
+
+def left_grammar(nonterminals, terminals="abcdefgh", rules=3, seed=0):
+    """Леволинейная грамматика: <N> -> <M> a | ... | b (вход lw3)."""
+    rng = random.Random(seed)
+    names = ["S"] + [f"N{i}" for i in range(1, nonterminals)]
+    lines = []
+    for name in names:
+        parts = [f"<{rng.choice(names)}> {rng.choice(terminals)}" for _ in range(rules)]
+        parts.append(rng.choice(terminals))
+        lines.append(f"<{name}> -> " + " | ".join(parts))
+    return "\n".join(lines) + "\n"
+
+
+def random_nfa(states, symbols="ab", moves=2, eps=1, seed=0):
+    """Случайный НКА с ε-циклами (вход lw4): в среднем moves переходов и eps ε-переходов на состояние."""
+    rng = random.Random(seed)
+    nfa = CompactAutomaton()
+    for s in range(states):
+        nfa.state_id(f"q{s}", "F" if rng.random() < 0.1 else "")
+    for symbol in symbols:
+        nfa.symbol_id(symbol)
+    for s in range(states):
+        for _ in range(moves):
+            nfa.add_transition(s, rng.choice(symbols), rng.randrange(states))
+        for _ in range(eps):
+            # ε-переходы в основном назад: получаются длинные ε-циклы
+            nfa.add_transition(s, "ε", rng.randrange(s + 1))
+    return nfa
+
+
+def adversarial_nfa(n):
+    """НКА для (a|b)*a(a|b){n}: у его ДКА 2^(n+1) состояний, плюс ε-кольцо на входе."""
+    nfa = CompactAutomaton()
+    ring = [nfa.state_id(f"r{i}") for i in range(4)]
+    for i, s in enumerate(ring):
+        nfa.add_transition(s, "ε", ring[(i + 1) % len(ring)])
+    chain = [nfa.state_id(f"c{i}") for i in range(n + 2)]
+    nfa.outputs[chain[-1]] = "F"
+    for symbol in "ab":
+        nfa.add_transition(ring[0], symbol, ring[0])
+    nfa.add_transition(ring[-1], "a", chain[0])
+    for i in range(n + 1):
+        for symbol in "ab":
+            nfa.add_transition(chain[i], symbol, chain[i + 1])
+    return nfa
+
+
+def nested_regex(depth, seed=0):
+    """Глубоко вложенное выражение со всеми операциями (вход lw5)."""
+    rng = random.Random(seed)
+    expr = rng.choice("abc")
+    for _ in range(depth):
+        kind = rng.randrange(4)
+        other = rng.choice("abc")
+        if kind == 0:
+            expr = f"({expr}|{other})"
+        elif kind == 1:
+            expr = f"({expr}){rng.choice('*+')}"
+        elif kind == 2:
+            expr = f"{other}({expr})"
+        else:
+            expr = f"({expr}){other}"
+    return expr
+
+
+def long_regex(length, seed=0):
+    """Длинное плоское выражение: альтернативы коротких слов со звёздочками."""
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < length:
+        word = "".join(rng.choice("abcd") for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.3:
+            word += "*"
+        words.append(word)
+        size += len(word) + 1
+    return "|".join(words)
+
+
+def class_regex(length, seed=0):
+    """Альтернативы слов из классов [a-z], [^...], \\d, \\w и '.' (вход lw5)."""
+    rng = random.Random(seed)
+    atoms = ["[a-z]", "[^a-f]", "[0-9a-f]", "\\d", "\\w", ".", "x", "q"]
+    words = []
+    size = 0
+    while size < length:
+        word = "".join(rng.choice(atoms) + rng.choice(["", "", "*", "+"]) for _ in range(rng.randint(1, 4)))
+        words.append(word)
+        size += len(word) + 1
+    return "|".join(words)
+
+
+_PASCAL_WORDS = ["x", "y", "counter", "total", "idx", "value_1", "_tmp"]
+
+
+def pascal_source(lines, seed=0, long_comment=0):
+    """Синтетическая программа на Паскале примерно из lines строк (вход lw6).
+
+    long_comment — добавить в начало комментарий {...} на столько строк и
+    столько же пустых строк подряд: лексема, растянутая на много блоков.
+    """
+    rng = random.Random(seed)
+    out = ["program Bench;", "var x, y, counter, total, idx, value_1, _tmp: integer;", "begin"]
+    if long_comment:
+        out.append("  { long comment")
+        out.extend(f"    line {i} of a very long comment" for i in range(long_comment))
+        out.append("  }")
+        out.extend([""] * long_comment)
+    while len(out) < lines:
+        kind = rng.randrange(6)
+        a, b = rng.choice(_PASCAL_WORDS), rng.choice(_PASCAL_WORDS)
+        if kind == 0:
+            out.append(f"  {a} := {b} + {rng.randint(0, 9999)} * ({a} - {rng.random() * 100:.3f});")
+        elif kind == 1:
+            out.append(f"  if ({a} <> {b}) and ({a} >= 1) then {a} := {b} else {b} := {a};")
+        elif kind == 2:
+            text = "".join(rng.choice(string.ascii_letters + " ") for _ in range(rng.randint(0, 30)))
+            out.append(f"  writeln('{text}', {a}); // {text}")
+        elif kind == 3:
+            out.append("  { block comment")
+            out.append(f"    spanning lines {a} {b} }}")
+        elif kind == 4:
+            out.append(f"  for {a} := 1 to {rng.randint(1, 100)} do {b} := {b} + {a};")
+        else:
+            out.append(f"  while {a} < {rng.randint(1, 1000)} do begin {a} := {a} + 1 end;")
+    out.append("end.")
+    return "\n".join(out) + "\n"
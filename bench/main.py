@@ -0,0 +1,155 @@
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from automata import determinize, minimize, regex_to_dfa, thompson_nfa
+from pipeline.main import load_lab
+
+import generators
+
+# размеры входов: обычный прогон и быстрый (--quick)
+SIZES = {
+    "full": {"grammar": 3000, "nfa": 1000, "adversarial": 12, "nested": 300, "long": 600, "classes": 300, "pascal": 20000, "comment": 20000},
+    "quick": {"grammar": 300, "nfa": 300, "adversarial": 8, "nested": 60, "long": 150, "classes": 100, "pascal": 2000, "comment": 5000},
+}
+
+
+def grammar_case(lw3, text, stream=False):
+    def run():
+        if stream:
+            # путь grammar_file_to_automaton: автомат строится прямо при разборе
+            return lw3.grammar_lines_to_automaton(lw3.read_grammar_lines(io.StringIO(text)))
+        transitions, leftGr = lw3.parse_grammar(lw3.preprocess_grammar(text))
+        if leftGr:
+            return lw3.generate_left_moore_automaton(transitions)
+        return lw3.generate_right_moore_automaton(transitions)
+    return run
+
+
+def lexer_case(lw6, source, block_size=None):
+    def run():
+        lexer = lw6.PascalLexer(io.StringIO(source), block_size=block_size)
+        count = 0
+        while lexer.next_token() is not None:
+            count += 1
+        return count
+    return run
+
+
+def build_cases(sizes):
+    """Список (группа, имя, функция без аргументов); входы генерируются заранее."""
+    lw3, lw4, lw5, lw6 = (load_lab(name) for name in ('lw3', 'lw4', 'lw5', 'lw6'))
+
+    nfa = generators.random_nfa(sizes["nfa"])
+    adversarial = generators.adversarial_nfa(sizes["adversarial"])
+    nfa_states = {state['state']: state for state in nfa.to_moore_list()}
+    dfa = determinize(nfa)
+    nested = generators.nested_regex(sizes["nested"])
+    long = generators.long_regex(sizes["long"])
+    classes = generators.class_regex(sizes["classes"])
+    commented = generators.pascal_source(sizes["pascal"], long_comment=sizes["comment"])
+
+    return [
+        ("lw3", "right_grammar", grammar_case(lw3, generators.right_grammar(sizes["grammar"]))),
+        ("lw3", "left_grammar", grammar_case(lw3, generators.left_grammar(sizes["grammar"]))),
+        ("lw3", "right_grammar_stream", grammar_case(lw3, generators.right_grammar(sizes["grammar"]), stream=True)),
+        ("lw4", "convert_nfa_to_dfa", lambda: lw4.convert_nfa_to_dfa(nfa_states, list(nfa.symbols))),
+        ("lw4", "determinize_random", lambda: determinize(nfa)),
+        ("lw4", "determinize_adversarial", lambda: determinize(adversarial)),
+        ("lw4", "minimize", lambda: minimize(dfa)),
+        ("lw5", "thompson_nfa_nested", lambda: thompson_nfa(lw5.parse_regex(nested))),
+        ("lw5", "thompson_nfa_long", lambda: thompson_nfa(lw5.parse_regex(long))),
+        ("lw5", "regex_to_dfa_nested", lambda: regex_to_dfa(lw5.parse_regex(nested))),
+        ("lw5", "regex_to_dfa_classes", lambda: regex_to_dfa(lw5.parse_regex(classes))),
+        ("lw6", "next_token", lexer_case(lw6, generators.pascal_source(sizes["pascal"]))),
+        ("lw6", "next_token_long_comment", lexer_case(lw6, commented)),
+        ("lw6", "next_token_long_comment_block", lexer_case(lw6, commented, block_size=1 << 16)),
+    ]
+
+
+def measure(run, repeat):
+    """Лучшее время из repeat прогонов и пик памяти отдельного прогона под tracemalloc."""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_kb": peak // 1024}
+
+
+def load_history(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def find_regressions(history, results, threshold):
+    """Случаи, которые стали медленнее лучшего из последних запусков больше чем на threshold."""
+    regressions = []
+    for name, result in results.items():
+        previous = [run["results"][name]["seconds"] for run in history[-5:] if name in run["results"]]
+        if previous and result["seconds"] > min(previous) * (1 + threshold):
+            regressions.append((name, min(previous), result["seconds"]))
+    return regressions
+
+
+def main():
+    options = dict(arg[2:].partition('=')[::2] for arg in sys.argv[1:] if arg.startswith('--'))
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+
+    if args:
+        print("Usage: python bench/main.py [--quick] [--only=lw3,lw4,...] [--repeat=N]"
+              " [--history=FILE] [--threshold=0.25] [--no-save]")
+        sys.exit(1)
+
+    mode = "quick" if 'quick' in options else "full"
+    repeat = int(options.get('repeat') or 3)
+    threshold = float(options.get('threshold') or 0.25)
+    history_file = options.get('history') or os.path.join(ROOT, 'bench_history.json')
+    only = set(options['only'].split(',')) if options.get('only') else None
+
+    results = {}
+    for group, name, run in build_cases(SIZES[mode]):
+        if only is not None and group not in only:
+            continue
+        key = f"{mode}/{group}/{name}"
+        results[key] = measure(run, repeat)
+        print(f"{key:<40} {results[key]['seconds'] * 1000:10.2f} ms {results[key]['peak_kb']:10d} KiB")
+
+    history = load_history(history_file)
+    regressions = find_regressions(history, results, threshold)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms")
+
+    if 'no-save' not in options:
+        history.append({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "results": results,
+        })
+        with open(history_file, 'w', encoding='utf-8') as file:
+            json.dump(history, file, indent=1)
+
+    if regressions:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,105 @@
 ﻿import re
+from array import array
 from collections import defaultdict
-import csv
+from functools import partial
+import os
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from automata import CompactAutomaton, determinize, metrics, minimize, remove_unreachable_states
+from automata.batch import read_manifest, report, run_batch
+from automata.table_io import save_automaton, table_order
+
+# регулярки компилируются один раз на процесс, а не на каждую грамматику
+CONTINUATION_REGEX = re.compile(r'\|\s*\n\s*')
+LEFT_RULE_REGEX = re.compile(r'^\s*<(\w+)>\s*->\s*((?:<\w+>\s+)?[\wε](?:\s*\|\s*(?:<\w+>\s+)?[\wε])*)\s*$')
+RIGHT_RULE_REGEX = re.compile(r'^\s*<(\w+)>\s*->\s*([\wε](?:\s+<\w+>)?(?:\s*\|\s*[\wε](?:\s+<\w+>)?)*)\s*$')
+
 def preprocess_grammar(grammar_text):
-    processed_text = re.sub(r'\|\s*\n\s*', '| ', grammar_text.strip())
+    processed_text = CONTINUATION_REGEX.sub('| ', grammar_text.strip())
     return processed_text
 
+def read_grammar_lines(file):
+    """Построчное чтение грамматики со склейкой продолжений, как preprocess_grammar.
+
+    Строка, которая заканчивается на '|', склеивается со следующей непустой
+    строкой; в памяти держится только текущее правило, а не весь файл.
+    """
+    rule = None
+    for line in file:
+        if rule is not None:
+            line = line.strip()
+            if not line:
+                continue
+            line = rule + ' ' + line
+        line = line.rstrip()
+        if line.endswith('|'):
+            rule = line
+            continue
+        rule = None
+        yield line
+    if rule is not None:
+        yield rule
+
 def parse_grammar(grammar_text):
     """Парсинг грамматики для определения её типа и генерации переходов."""
-    lines = grammar_text.strip().split('\n')
+    return parse_grammar_lines(grammar_text.strip().split('\n'))
+
+def parse_grammar_lines(lines):
+    """Разбор правил в словарь переходов {нетерминал: [(терминал, нетерминал)]}."""
     transitions = defaultdict(list)
-    start_symbol = None
-    first_line = lines[0].strip()
-    leftGr = False
-    left_regex = re.compile(r'^\s*<(\w+)>\s*->\s*((?:<\w+>\s+)?[\wε](?:\s*\|\s*(?:<\w+>\s+)?[\wε])*)\s*$')
-    right_regex = re.compile(r'^\s*<(\w+)>\s*->\s*([\wε](?:\s+<\w+>)?(?:\s*\|\s*[\wε](?:\s+<\w+>)?)*)\s*$')
 
-    for i, line in enumerate(lines):
-        line = line.strip()
-        right_match = right_regex.match(line)
-        left_match = left_regex.match(line)
-
-        if bool(left_match) != bool(right_match):
-            if left_match:
-                leftGr = True
-            elif right_match:
-                leftGr = False
-            break
-        
-    for i, line in enumerate(lines):
-        line = line.strip()
-        right_match = right_regex.match(line)
-        left_match = left_regex.match(line)
+    def add(source, terminal, target):
+        transitions[source].append((terminal, target))
 
+    return transitions, scan_grammar_lines(lines, add)
+
+def scan_grammar_lines(lines, add):
+    """Определение типа и разбор правил за один проход по строкам.
+
+    Каждый переход отдаётся в add(откуда, терминал, куда); возвращает
+    True для левой грамматики. Пока тип не ясен (строка подходит под обе
+    формы, как <S> -> a), совпадения строк откладываются; первая
+    однозначная строка решает тип, после чего каждая строка проверяется
+    только своей регуляркой. Если однозначных строк нет, грамматика
+    считается правой.
+    """
+    leftGr = None
+    pending = []  # (left_match, right_match) строк до определения типа
+    left_regex = LEFT_RULE_REGEX
+    right_regex = RIGHT_RULE_REGEX
+
+    for line in lines:
+        line = line.strip()
         if not line:
             continue
-        if leftGr:
-            process_left_rule(left_match, transitions)
+        if leftGr is None:
+            left_match = left_regex.match(line)
+            right_match = right_regex.match(line)
+            if bool(left_match) == bool(right_match):
+                pending.append((left_match, right_match))
+                continue
+            leftGr = bool(left_match)
+            pending.append((left_match, right_match))
+            for left_match, right_match in pending:
+                if leftGr:
+                    process_left_rule(left_match, add)
+                else:
+                    process_right_rule(right_match, add)
+            pending = None
+        elif leftGr:
+            process_left_rule(left_regex.match(line), add)
         else:
-            process_right_rule(right_match, transitions)
+            process_right_rule(right_regex.match(line), add)
 
-    return transitions, leftGr
+    if leftGr is None:
+        leftGr = False
+        for _, right_match in pending:
+            process_right_rule(right_match, add)
 
-def process_left_rule(match, transitions):
+    return leftGr
+
+def process_left_rule(match, add):
     """Обработка левого правила."""
     next_non_terminal = match.group(1)
     rules = match.group(2).split('|')
@@ -53,15 +109,15 @@ def process_left_rule(match, transitions):
         parts = rule.split()
         if len(parts) == 1:
             terminal = parts[0]
-            transitions["startSym"].append((terminal, next_non_terminal))
+            add("startSym", terminal, next_non_terminal)
             #print("H", terminal, next_non_terminal)
         else:
             prev_non_terminal = parts[0].replace('<', '').replace('>', '')
             terminal = parts[1] if len(parts) > 1 else ''
-            transitions[prev_non_terminal].append((terminal, next_non_terminal))
+            add(prev_non_terminal, terminal, next_non_terminal)
             #print(prev_non_terminal, terminal, next_non_terminal)
 
-def process_right_rule(match, transitions):
+def process_right_rule(match, add):
     """Обработка правого правила."""
     non_terminal = match.group(1)
     rules = match.group(2).split('|')
@@ -71,11 +127,28 @@ def process_right_rule(match, transitions):
         parts = rule.split()
         if len(parts) == 1:
             terminal = parts[0]
-            transitions[non_terminal].append((terminal, "F"))
+            add(non_terminal, terminal, "F")
         else:
             terminal = parts[0]
             next_non_terminal = parts[1].replace('<', '').replace('>', '')
-            transitions[non_terminal].append((terminal, next_non_terminal))
+            add(non_terminal, terminal, next_non_terminal)
+
+
+def group_by_terminal(trans, state_mapping):
+    """Переходы одного нетерминала, сгруппированные по терминалу.
+
+    Один проход по правилам нетерминала вместо перебора всего алфавита;
+    пустые переходы не выводятся.
+    """
+    by_terminal = {}
+    for terminal, next_non_terminal in trans:
+        next_state = state_mapping[next_non_terminal]["state"]
+        targets = by_terminal.get(terminal)
+        if targets is None:
+            by_terminal[terminal] = [next_state]
+        else:
+            targets.append(next_state)
+    return [{"inputSym": terminal, "nextPos": targets} for terminal, targets in by_terminal.items()]
 
 
 def generate_right_moore_automaton(transitions):
@@ -95,62 +168,22 @@ def generate_right_moore_automaton(transitions):
         "state": f"q{state_counter}",
         "output": f"F"
     }
-    # for state, trans in transitions.items():
-    #     print(state, trans)
-    all_input_symbols = set()
-    for state, trans in transitions.items():
-        for terminal, _ in trans:
-            all_input_symbols.add(terminal)
-    # for rules in transitions.values():
-    #     for _, next_non_terminal in rules:
-    #         if next_non_terminal and next_non_terminal not in state_mapping:
-    #             state_mapping[next_non_terminal] = {
-    #                 "state": f"q{state_counter}",
-    #                 "output": f"y{state_counter}"
-    #             }
-    #             state_counter += 1
-
-    # Генерация переходов автомата Мура
-    moore_automaton = []
 
+    moore_automaton = []
     for state, trans in transitions.items():
-        current_state = state_mapping[state]["state"]
-        current_output = state_mapping[state]["output"]
-
-        transitions_list = []
-
-        for symbol in all_input_symbols:
-            next_states = []
-            # Находим переход для данного символа
-            for terminal, next_state_row in trans:
-                if terminal == symbol:
-                    next_states.append(state_mapping[next_state_row]["state"])
-
-            # Если перехода нет, оставляем next_state пустым
-            # if not next_state:
-            #     next_state = ""
-            next_state = next_states if next_states else []
-
-
-            transitions_list.append({"inputSym": symbol, "nextPos": next_state})
-
         moore_automaton.append({
-            "state": current_state,
-            "output": current_output,
-            "transitions": transitions_list
+            "state": state_mapping[state]["state"],
+            "output": state_mapping[state]["output"],
+            "transitions": group_by_terminal(trans, state_mapping)
         })
-        #print(current_state, current_output, transitions_list)
 
+    # все терминалы уже встретились в переходах выше
     moore_automaton.append({
         "state": state_mapping["F"]["state"],
         "output": state_mapping["F"]["output"],
-        "transitions": [{"inputSym": _, "nextPos": []} for _ in all_input_symbols]
+        "transitions": []
     })
 
-
-    # for state in moore_automaton:
-    #     print(state)
-
     return moore_automaton
 
 def generate_left_moore_automaton(transitions):
@@ -194,124 +227,198 @@ def generate_left_moore_automaton(transitions):
     }
 
 
-    all_input_symbols = set()
-    for state, trans in transitions.items():
-        for terminal, _ in trans:
-            all_input_symbols.add(terminal)
     moore_automaton = []
-
-
-
     for state, trans in transitions.items():
-        current_state = state_mapping[state]["state"]
         current_output = state_mapping[state]["output"]
         if current_output == "F":
             finalstate = True
-        transitions_list = []
-
-        for symbol in all_input_symbols:
-            next_states = []
-            # Находим переход для данного символа
-            for terminal, next_state_row in trans:
-
-                if terminal == symbol:
-                    next_states.append(state_mapping[next_state_row]["state"])
-
-            next_state = next_states if next_states else []
-
-            # Если перехода нет, оставляем next_state пустым
-            if not next_state:
-                next_state = ""
-
-            transitions_list.append({"inputSym": symbol, "nextPos": next_state})
-
         moore_automaton.append({
-            "state": current_state,
+            "state": state_mapping[state]["state"],
             "output": current_output,
-            "transitions": transitions_list
+            "transitions": group_by_terminal(trans, state_mapping)
         })
-        # print(current_state, current_output, transitions_list)
     if not finalstate:
         moore_automaton.append({
             "state": state_mapping[list(transitions.values())[0][0][1]]["state"],
             "output": "F",
-            "transitions": [{"inputSym": _, "nextPos": []} for _ in all_input_symbols]
+            "transitions": []
         })
 
-    # for state in moore_automaton:
-    #     print(state)
-
     moore_automaton = sorted(moore_automaton, key=lambda x: x["state"])
 
     return moore_automaton
 
 
+def grammar_lines_to_automaton(lines):
+    """Грамматика -> CompactAutomaton прямо во время разбора строк.
+
+    Переходы сразу ложатся в автомат, без словаря переходов и списка
+    состояний Мура. Состояния временно называются нетерминалами, а в конце
+    получают те же номера q0, q1, ... и тот же порядок, что дают
+    generate_right_moore_automaton и generate_left_moore_automaton.
+    """
+    automaton = CompactAutomaton()
+    sources = []  # состояния в порядке первого появления слева, как ключи transitions
+    rank = array('l')  # номер состояния в sources или -1
+    seen = array('q')  # первое появление справа при обходе transitions: ранг << 32 | номер правила
+    counts = array('l')  # правил у каждого состояния из sources
+    never = 1 << 62
+
+    def add(source, terminal, target):
+        src = automaton.state_id(source)
+        if src == len(rank):
+            rank.append(-1)
+            seen.append(never)
+        if rank[src] < 0:
+            rank[src] = len(sources)
+            sources.append(src)
+            counts.append(0)
+        dst = automaton.state_id(target)
+        if dst == len(rank):
+            rank.append(-1)
+            seen.append(never)
+        r = rank[src]
+        key = r << 32 | counts[r]
+        counts[r] += 1
+        if key < seen[dst]:
+            seen[dst] = key
+        automaton.add_transition(src, terminal, dst)
+
+    leftGr = scan_grammar_lines(lines, add)
+    number = [None] * len(rank)
+    if leftGr:
+        # q0 занят под startSym, даже если таких правил нет
+        start_sym = automaton.state_index.get("startSym")
+        counter = 1
+        for sid in sources:
+            if sid != start_sym:
+                number[sid] = counter
+                counter += 1
+        for sid in sorted((sid for sid in range(len(rank)) if rank[sid] < 0), key=seen.__getitem__):
+            number[sid] = counter
+            counter += 1
+        if start_sym is not None:
+            number[start_sym] = 0
+        # первое правило первого нетерминала ведёт в заключительное состояние;
+        # оно получает новый номер, как в generate_left_moore_automaton
+        final = seen.index(0)
+        number[final] = counter
+        automaton.outputs[final] = "F"
+        order = sorted(range(len(number)), key=lambda sid: f"q{number[sid]}")
+    else:
+        final = automaton.state_id("F", "F")
+        counter = 0
+        for sid in sources:
+            number[sid] = counter
+            counter += 1
+        number.extend([None] * (len(automaton) - len(number)))
+        # нетерминалы без правил, которые только упоминаются справа, идут после F
+        for sid in [final] + list(range(len(number))):
+            if number[sid] is None:
+                number[sid] = counter
+                counter += 1
+        order = sorted(range(len(number)), key=number.__getitem__)
+    return _renumber(automaton, order, [f"q{number[sid]}" for sid in order])
+
+def _renumber(automaton, order, names):
+    """Переставляет состояния автомата на месте: порядок order, имена names.
+
+    Символы нумеруются заново по первому появлению, как в from_moore_list.
+    Строки переходов переносятся по одной, так что второй копии автомата
+    в памяти не бывает.
+    """
+    remap = [0] * len(order)
+    for new, sid in enumerate(order):
+        remap[sid] = new
+    symbols, moves, eps, outputs = automaton.symbols, automaton.moves, automaton.eps, automaton.outputs
+    automaton.state_names = names
+    automaton.state_index = {name: new for new, name in enumerate(names)}
+    automaton.outputs = [outputs[sid] for sid in order]
+    automaton.symbols = []
+    automaton.symbol_index = {}
+    automaton.moves = [None] * len(order)
+    automaton.eps = [None] * len(order)
+    for new, sid in enumerate(order):
+        row = moves[sid]
+        moves[sid] = None
+        automaton.moves[new] = {automaton.symbol_id(symbols[aid]): [remap[t] for t in targets]
+                                for aid, targets in row.items()}
+        automaton.eps[new] = [remap[t] for t in eps[sid]]
+        eps[sid] = None
+    automaton.start = 0
+    return automaton
 
 
 
-def export_moore_automaton_to_csv(moore_automaton, filename):
-    # Получаем все уникальные inputSym
-    all_input_symbols = set()
-    for state in moore_automaton:
-        for transition in state['transitions']:
-            #if transition['nextPos']:  # используемые символы ввода
-            all_input_symbols.add(transition['inputSym'])
-
-    all_input_symbols = sorted(all_input_symbols)
-
-    with open(filename, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file, delimiter=';')
-
-        output_row = ['']
-        for state in moore_automaton:
-            output_row.append(state['output'])
-        writer.writerow(output_row)
-
-        headers = [''] + [state['state'] for state in moore_automaton]
-        writer.writerow(headers)
-
-        #создаем строку в CSV
-        for symbol in all_input_symbols:
-            row = [symbol]
-
-            for state in moore_automaton:
-                # Ищем переход для данного символа
-                next_states = []
-                for transition in state['transitions']:
-                    if transition['inputSym'] == symbol:
-                        next_states.append(transition['nextPos'])
-                    #  несколько переходов
-                #row.append(next_states)
-
-                output_str = ','.join(next_states[0])
-                row.append(output_str)
-            writer.writerow(row)
 
-    print(f"Moore automaton exported to {filename}")
 
+def export_moore_automaton_to_csv(moore_automaton, filename):
+    save_automaton(CompactAutomaton.from_moore_list(moore_automaton), filename)
+    print(f"Moore automaton exported to {filename}")
 
 
 
-def main():
-    if len(sys.argv) != 3:
-        print("Usage: lab3 grammar.txt output.csv")
-        sys.exit(1)
 
-    grammar_file = sys.argv[1]
-    output_file = sys.argv[2]
+def grammar_file_to_automaton(grammar_file, prune=False, stage="nfa"):
+    """Грамматика из файла -> CompactAutomaton; файл читается потоково.
 
+    stage "dfa" сразу строит ДКА подмножествами, "min" ещё и минимизирует
+    его: результат тот же, что у lw4 на таблице lw3, но без записи и
+    повторного чтения CSV.
+    """
     with open(grammar_file, 'r', encoding='utf-8') as file:
-        input_grammar = file.read()
+        automaton = grammar_lines_to_automaton(read_grammar_lines(file))
+    if prune:
+        automaton = remove_unreachable_states(automaton)
+    if stage == "nfa":
+        return automaton
+    # нумерация как после чтения таблицы: те же имена S0, S1, ..., что у lw4
+    automaton = determinize(table_order(automaton))
+    return minimize(automaton) if stage == "min" else automaton
+
+
+def run_batch_mode(manifest, output, prune, jobs, stage="nfa"):
+    """Грамматики по списку из manifest; пути считаются от каталога манифеста.
+
+    Имя выхода по умолчанию — путь грамматики от каталога манифеста с
+    расширением .csv, так что a/x.txt и b/x.txt не сливаются в один x.csv.
+    """
+    base = os.path.dirname(os.path.abspath(manifest))
+    items = []
+    for grammar_file, name in read_manifest(manifest):
+        path = os.path.join(base, grammar_file)
+        if name is None:
+            relative = os.path.relpath(path, base)
+            if relative.startswith(os.pardir) or os.path.isabs(relative):
+                # вне каталога манифеста: только имя файла, совпадения отсеет run_batch
+                relative = os.path.basename(relative)
+            name = os.path.splitext(relative)[0] + ".csv"
+        items.append((path, name))
+    report(*run_batch(items, partial(grammar_file_to_automaton, prune=prune, stage=stage), output, jobs))
 
-    input_grammar = preprocess_grammar(input_grammar)
-    transitions, leftGr = parse_grammar(input_grammar)
 
-    if leftGr:
-        moore_automaton = generate_left_moore_automaton(transitions)
-    else:
-        moore_automaton = generate_right_moore_automaton(transitions)
+def main():
+    flags = {arg for arg in sys.argv[1:] if arg.startswith('--')}
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    stage = ("min" if '--minimize' in flags else "dfa") if '--dfa' in flags else "nfa"
+
+    if len(args) != 2:
+        print("Usage: lab3 [--prune] [--dfa [--minimize]] grammar.txt output.csv|output.aut")
+        print("       lab3 [--prune] [--dfa [--minimize]] [--jobs=N] --batch"
+              " manifest.txt|manifest.jsonl output_dir|output.zip")
+        sys.exit(1)
+
+    if '--batch' in flags:
+        jobs = next((int(flag.partition('=')[2]) for flag in flags if flag.startswith('--jobs=')), None)
+        run_batch_mode(args[0], args[1], '--prune' in flags, jobs, stage)
+        return
+
+    grammar_file = args[0]
+    output_file = args[1]
 
-    #moore_automaton = remove_unreachable_states(moore_automaton)
-    export_moore_automaton_to_csv(moore_automaton, output_file)
+    automaton = grammar_file_to_automaton(grammar_file, '--prune' in flags, stage)
+    save_automaton(automaton, output_file)
+    print(f"Moore automaton exported to {output_file}")
 if __name__ == "__main__":
-    main()
+    # общие флаги --metrics, --profile, --trace
+    metrics.run(main)
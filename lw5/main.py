@@ -1,248 +1,251 @@
 import re
 from collections import defaultdict
-import csv
+from functools import partial
+import os
 import sys
 
-def export_moore_automaton_to_csv(moore_automaton, filename, start_state):
-    # Получаем все уникальные inputSym
-    all_input_symbols = set()
-
-    for key in moore_automaton:
-        state = moore_automaton[key]
-        for transition in state['transitions']:
-            #if transition['nextPos']:  # используемые символы ввода
-            all_input_symbols.add(transition['inputSym'])
-
-    all_input_symbols = sorted(all_input_symbols)
-
-    state_keys = [start_state] + [key for key in moore_automaton if key != start_state]
-    with open(filename, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file, delimiter=';')
-
-        # Первая строка: выходные значения
-        output_row = [''] + [moore_automaton[key]['output'] for key in state_keys]
-        writer.writerow(output_row)
-
-        # Вторая строка: имена состояний
-        headers = [''] + state_keys
-        writer.writerow(headers)
-
-        # Остальные строки: переходы для каждого символа ввода
-        for symbol in all_input_symbols:
-            row = [symbol]
-            for key in state_keys:
-                # Ищем переход для данного символа
-                state = moore_automaton[key]
-                next_states = [
-                    transition['nextPos']
-                    for transition in state['transitions']
-                    if transition['inputSym'] == symbol
-                ]
-
-                if not next_states:
-                    row.append('')  # Пустая ячейка, если нет переходов
-                else:
-                    output_str = ','.join(next_states)  # Все состояния через запятую
-                    row.append(output_str)
-
-            writer.writerow(row)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from automata import CompactAutomaton, CompileCache, metrics, minimize, regex_to_dfa, thompson_nfa, union_nfa
+from automata.regex_dfa import concat, rules_to_dfa, union
+from automata.batch import read_manifest, report, run_batch
+from automata.charclass import DIGITS, SPACE, WORD, complement, compress_classes, compress_forest, normalize
+from automata.table_io import save_automaton
 
+def export_moore_automaton_to_csv(moore_automaton, filename, start_state):
+    automaton = CompactAutomaton.from_moore(moore_automaton)
+    automaton.start = automaton.state_index[start_state]
+    save_automaton(automaton, filename)
     print(f"Moore automaton exported to {filename}")
 
 
-def parse_regex(pattern):
-    def parse_or(expr):
-        #print(expr)
-        parts = []
-        current = []
-        depth = 0  # вложенность скобок
-        for char in expr:
-            if char == "(":
-                depth += 1
-            elif char == ")":
-                depth -= 1
-            elif char == "|" and depth == 0:  #только на верхнем уровне
-                parts.append("".join(current))
-                current = []
+ESCAPE_CLASSES = {'d': DIGITS, 'w': WORD, 's': SPACE}
+ESCAPE_CHARS = {'n': "\n", 'r': "\r", 't': "\t"}
+
+
+def escape_ranges(pattern, i):
+    """Диапазоны для '\\x' в позиции i: \\d, \\w, \\s, их отрицания, \\n, \\r, \\t или сам символ x."""
+    if i + 1 >= len(pattern):
+        raise ValueError(f"Trailing backslash at position {i}")
+    char = pattern[i + 1]
+    if char.lower() in ESCAPE_CLASSES:
+        ranges = ESCAPE_CLASSES[char.lower()]
+        return ranges if char.islower() else complement(ranges)
+    char = ESCAPE_CHARS.get(char, char)
+    return [(ord(char), ord(char))]
+
+
+def parse_class(pattern, i):
+    """Разбор [...] или [^...] с позиции i; возвращает (диапазоны, позиция после ']')."""
+    start = i
+    i += 1
+    negated = i < len(pattern) and pattern[i] == "^"
+    if negated:
+        i += 1
+    ranges = []
+    first = True
+    while True:
+        if i >= len(pattern):
+            raise ValueError(f"Unmatched bracket at position {start}")
+        char = pattern[i]
+        if char == "]" and not first:
+            break
+        first = False
+        if char == "\\":
+            item = escape_ranges(pattern, i)
+            i += 2
+        else:
+            item = [(ord(char), ord(char))]
+            i += 1
+        # диапазон a-z; '-' в конце или после класса вроде \\d — обычный символ
+        if (len(item) == 1 and item[0][0] == item[0][1] and i + 1 < len(pattern)
+                and pattern[i] == "-" and pattern[i + 1] != "]"):
+            if pattern[i + 1] == "\\":
+                end = escape_ranges(pattern, i + 1)
+                i += 3
+            else:
+                end = [(ord(pattern[i + 1]), ord(pattern[i + 1]))]
+                i += 2
+            if len(end) != 1 or end[0][0] != end[0][1] or end[0][0] < item[0][0]:
+                raise ValueError(f"Invalid range at position {start}")
+            item = [(item[0][0], end[0][0])]
+        ranges.extend(item)
+    ranges = normalize(ranges)
+    return (complement(ranges) if negated else ranges), i + 1
+
+
+def parse_regex(pattern, compress=True):
+    """Разбор регулярного выражения за один проход по строке без рекурсии.
+
+    Дерево то же, что строил рекурсивный разбор: альтернативы и конкатенации
+    вложены вправо, пустые скобки дают ε. На стеке лежат незакрытые скобки:
+    для каждой — уже готовые альтернативы, части текущей конкатенации и
+    позиция начала текущей альтернативы (от неё считаются позиции в ошибках).
+    Классы [a-z], [^...], '.' и \\d, \\w, \\s в конце заменяются символами
+    классов эквивалентности (compress_classes), если compress не выключен.
+    """
+    alternatives = []
+    parts = []
+    alt_start = 0
+    stack = []
+
+    i = 0
+    n = len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == "(":
+            if i + 1 < n and pattern[i + 1] == ")":  # Если скобки пустые, добавить `e`
+                parts.append({"type": "Literal", "value": "ε"})
+                i += 2
                 continue
-            current.append(char)
-
-        parts.append("".join(current))
-        if len(parts) > 1:
-            return {"type": "Or", "left": parse_concat(parts[0]), "right": parse_or("|".join(parts[1:]))}
-        return parse_concat(expr)
-
-    def parse_concat(expr):
-        parts = []
-        i = 0
-        while i < len(expr):
-            if expr[i] == "(":
-                end = find_closing_parenthesis(expr, i)
-                sub_expr = expr[i + 1:end]
-                if sub_expr == "":  # Если скобки пустые, добавить `e`
-                    parts.append({"type": "Literal", "value": "ε"})
-                else:
-                    parts.append(parse_or(sub_expr))
-                i = end + 1
-            elif expr[i] in "*+":
-                if not parts:
-                    raise ValueError(f"Unexpected operator '{expr[i]}' at position {i}")
-                op = "Repeat" if expr[i] == "*" else "Plus"
-                parts[-1] = {"type": op, "expr": parts[-1]}
-                i += 1
+            stack.append((alternatives, parts, alt_start))
+            alternatives, parts, alt_start = [], [], i + 1
+        elif char == ")":
+            if not stack:
+                raise ValueError("Unmatched parenthesis in expression")
+            if not parts:
+                raise ValueError(f"Empty alternative at position {i}")
+            alternatives.append(concat(parts))
+            group = union(alternatives)
+            alternatives, parts, alt_start = stack.pop()
+            parts.append(group)
+        elif char == "|":
+            if not parts:
+                raise ValueError(f"Empty alternative at position {i}")
+            alternatives.append(concat(parts))
+            parts = []
+            alt_start = i + 1
+        elif char in "*+":
+            if not parts:
+                raise ValueError(f"Unexpected operator '{char}' at position {i - alt_start}")
+            op = "Repeat" if char == "*" else "Plus"
+            parts[-1] = {"type": op, "expr": parts[-1]}
+        elif char == "[":
+            ranges, i = parse_class(pattern, i)
+            parts.append({"type": "Class", "ranges": ranges})
+            continue
+        elif char == ".":
+            parts.append({"type": "Class", "ranges": complement([(ord("\n"), ord("\n"))])})
+        elif char == "\\":
+            ranges = escape_ranges(pattern, i)
+            if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+                parts.append({"type": "Literal", "value": chr(ranges[0][0])})
             else:
-                parts.append({"type": "Literal", "value": expr[i]})
-                i += 1
-
-        # Создание Б-дерева для конкатенации
-        if len(parts) == 1:
-            return parts[0]
-
-        #  Concat(a, Concat(b, c))
-        return build_concat_tree(parts)
-
-    def build_concat_tree(parts):
-        if len(parts) == 1:
-            return parts[0]
-
-        # Рекурсивно строим дерево конкатенации
-        left = parts[0]
-        right = build_concat_tree(parts[1:])
-        return {"type": "Concat", "left": left, "right": right}
-
-    def find_closing_parenthesis(expr, start):
-        depth = 1
-        #print(expr)
-        for i in range(start + 1, len(expr)):
-            if expr[i] == "(":
-                depth += 1
-            elif expr[i] == ")":
-                depth -= 1
-                if depth == 0:
-                    return i
-        raise ValueError("Unmatched parenthesis in expression")
-
-    return parse_or(pattern)
+                parts.append({"type": "Class", "ranges": ranges})
+            i += 1
+        else:
+            parts.append({"type": "Literal", "value": char})
+        i += 1
 
-state_counter = 1
-
-def add_eps_trans(nfa, start_state, final_state):
-    nfa[start_state]['transitions'].append({
-                                    'inputSym': 'ε',
-                                    'nextPos': final_state
-                                })
-    return nfa
-
-def new_state():
-    global state_counter
-    state = {
-            "state": f"q{state_counter}",
-            "output": '',
-            "transitions": []
-        }
-    state_counter += 1
-    return state
+    if stack:
+        raise ValueError("Unmatched parenthesis in expression")
+    if not parts:
+        raise ValueError(f"Empty alternative at position {n}")
+    alternatives.append(concat(parts))
+    tree = union(alternatives)
+    return compress_classes(tree) if compress else tree
+
+
+def read_patterns(filename):
+    """Шаблоны для --multi: список (дерево, номер шаблона).
+
+    Файл — как манифест пакетного режима: выражение в строке или JSON
+    {"input": выражение, "output": номер}; без номера шаблоны нумеруются
+    с 1. Номер из JSON может быть и числом: выходы автомата — строки.
+    Классы символов у всех шаблонов общие (compress_forest).
+    """
+    patterns = read_manifest(filename)
+    trees = compress_forest([parse_regex(regex, compress=False) for regex, _ in patterns])
+    return [(tree, str(number) if name is None or name == "" else str(name))
+            for number, (tree, (_, name)) in enumerate(zip(trees, patterns), 1)]
 
 def tree_to_nfa(regex, startState, finalState, nfa):
-    if regex['type'] == 'Literal':
-        global state_counter
-        start_state = new_state()
-        final_state = new_state()
-        start_state["transitions"].append({
-                                    'inputSym': regex['value'],
-                                    'nextPos': final_state['state']
-                                })
-
-        nfa[start_state['state']] = start_state
-        nfa[final_state['state']] = final_state
-
-        return nfa, start_state['state'], final_state['state']
-
-    elif regex['type'] == 'Concat':
-
-        left_nfa, lstart, lfinal = tree_to_nfa(regex['left'], startState, finalState, nfa)
-        right_nfa, rstart, rfinal = tree_to_nfa(regex['right'], startState, finalState, nfa)
-
-        nfa = add_eps_trans(nfa, lfinal, rstart)
-
-        return nfa, lstart, rfinal
-
-    elif regex['type'] == 'Or':
-
-        left_nfa, lstart, lfinal = tree_to_nfa(regex['left'], startState, finalState, nfa)
-        right_nfa, rstart, rfinal = tree_to_nfa(regex['right'], startState, finalState, nfa)
-
-        start_state = new_state()
-        final_state = new_state()
+    """НКА Томпсона в виде словаря состояний: обёртка над thompson_nfa.
 
-        nfa[start_state['state']] = start_state
-        nfa[final_state['state']] = final_state
+    startState и finalState не используются, они остались от старой
+    сигнатуры. Возвращает (nfa, имя старта, имя финала).
+    """
+    automaton = thompson_nfa(regex)
+    for state in automaton.to_moore_list():
+        nfa[state['state']] = state
+    return nfa, automaton.state_names[automaton.start], automaton.state_names[automaton.outputs.index("F")]
 
-        nfa = add_eps_trans(nfa, start_state['state'], lstart)
-        nfa = add_eps_trans(nfa, lfinal, final_state['state'])
+_caches = {}
 
-        nfa = add_eps_trans(nfa, start_state['state'], rstart)
-        nfa = add_eps_trans(nfa, rfinal, final_state['state'])
-
-        return nfa, start_state['state'], final_state['state']
-
-    elif regex['type'] == 'Repeat':
-
-        sub_nfa, sub_start, sub_final = tree_to_nfa(regex['expr'], startState, finalState, nfa)
-
-        start_state = new_state()
-        final_state = new_state()
-
-        nfa[start_state['state']] = start_state
-        nfa[final_state['state']] = final_state
-
-        nfa = add_eps_trans(nfa, start_state['state'], sub_start)
-        nfa = add_eps_trans(nfa, sub_final, sub_start)
-        nfa = add_eps_trans(nfa, sub_final, final_state['state'])
-        nfa = add_eps_trans(nfa, start_state['state'], final_state['state'])
-
-        return nfa, start_state['state'], final_state['state']
-
-    elif regex['type'] == 'Plus':
-
-        sub_nfa, sub_start, sub_final = tree_to_nfa(regex['expr'], startState, finalState, nfa)
-
-        start_state = new_state()
-        final_state = new_state()
-
-        nfa[start_state['state']] = start_state
-        nfa[final_state['state']] = final_state
-
-        nfa = add_eps_trans(nfa, start_state['state'], sub_start)
-        nfa = add_eps_trans(nfa, sub_final, sub_start)
-        nfa = add_eps_trans(nfa, sub_final, final_state['state'])
-
-        return nfa, start_state['state'], final_state['state']
+def regex_to_automaton(regex, stage="nfa", cache_dir=None):
+    """Регэксп -> автомат стадии stage; повторы и общие части переиспользуются через кэш."""
+    cache = _caches.get(cache_dir)
+    if cache is None:
+        cache = _caches[cache_dir] = CompileCache(directory=cache_dir)
+    return cache.get(parse_regex(regex), stage)
 
 def main():
-
-    if len(sys.argv) != 3:
-        print('Usage: /regexToNFA <output.csv> "<regex>"')
+    # сам регэксп может начинаться с '-', поэтому флаги только из известного списка
+    flags = {arg for arg in sys.argv[1:]
+             if arg in ('--dfa', '--minimize', '--batch', '--multi') or arg.startswith(('--cache-dir=', '--jobs='))}
+    args = [arg for arg in sys.argv[1:] if arg not in flags]
+    cache_dir = next((flag.partition('=')[2] for flag in flags if flag.startswith('--cache-dir=')), None)
+    stage = ("min" if '--minimize' in flags else "dfa") if '--dfa' in flags else "nfa"
+
+    if len(args) != 2:
+        print('Usage: /regexToNFA [--dfa [--minimize]] [--cache-dir=DIR] <output.csv|output.aut> "<regex>"')
+        print('       /regexToNFA [--dfa [--minimize]] [--cache-dir=DIR] [--jobs=N] --batch'
+              ' <output_dir|output.zip> <regexes.txt|regexes.jsonl>')
+        print('       /regexToNFA [--dfa [--minimize]] --multi <output.csv|output.aut> <patterns.txt|patterns.jsonl>')
         sys.exit(1)
 
-    output_file = sys.argv[1]
-    regex = sys.argv[2]
+    if '--multi' in flags:
+        # один автомат на все шаблоны: выход финального состояния — номер шаблона
+        rules = read_patterns(args[1])
+        if '--dfa' in flags:
+            automaton = rules_to_dfa(rules)
+            if '--minimize' in flags:
+                automaton = minimize(automaton)
+        else:
+            automaton = union_nfa(rules)
+        save_automaton(automaton, args[0])
+        print(f"Moore automaton exported to {args[0]}")
+        return
+
+    if '--batch' in flags:
+        jobs = next((int(flag.partition('=')[2]) for flag in flags if flag.startswith('--jobs=')), None)
+        build = partial(regex_to_automaton, stage=stage, cache_dir=cache_dir)
+        report(*run_batch(read_manifest(args[1]), build, args[0], jobs))
+        return
+
+    output_file = args[0]
+    regex = args[1]
 
     #output_file = "1.csv"
     #regex = "a+b(c|())x"
     parsed_tree = parse_regex(regex)
-    print(parsed_tree)
-
-    startState, finalState = "q0"
-    nfa = {}
-    nfa, start, final = tree_to_nfa(parsed_tree, startState, finalState, nfa)
-
-    print(start)
-    print(final)
-    nfa[final]['output'] = "F"
-    print(nfa)
-
-    export_moore_automaton_to_csv(nfa, output_file, start)
+    metrics.trace(parsed_tree)
+
+    if cache_dir:
+        # автомат берётся из кэша на диске или строится и кладётся туда
+        cache = CompileCache(directory=cache_dir)
+        save_automaton(cache.get(parsed_tree, stage), output_file)
+        print(f"Moore automaton exported to {output_file}")
+        return
+
+    if '--dfa' in flags:
+        # сразу ДКА по followpos, без НКА Томпсона и прогона через lw4
+        dfa = regex_to_dfa(parsed_tree)
+        if '--minimize' in flags:
+            dfa = minimize(dfa)
+        save_automaton(dfa, output_file)
+        print(f"Moore automaton exported to {output_file}")
+        return
+
+    # НКА Томпсона сразу в компактном виде, без словаря состояний
+    nfa = thompson_nfa(parsed_tree)
+    if metrics.TRACE:
+        metrics.trace(nfa.state_names[nfa.start])
+        metrics.trace(nfa.state_names[nfa.outputs.index("F")])
+        metrics.trace(nfa.to_moore_list())
+
+    save_automaton(nfa, output_file)
+    print(f"Moore automaton exported to {output_file}")
 
 if __name__ == "__main__":
-    main()
+    # общие флаги --metrics, --profile, --trace
+    metrics.run(main)
@@ -1,7 +1,21 @@
-import sys
+import codecs
+import io
+import mmap
+import os
 import re
+import sys
+import string
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from automata import metrics, minimize, rules_to_dfa
+from automata.matcher import CompiledDFA
+from automata.regex_dfa import concat, literal, plus, repeat, union
 
 class Token:
+    __slots__ = ("type", "lexeme", "line", "column")
+
     def __init__(self, type_, lexeme, line, column):
         self.type = type_
         self.lexeme = lexeme
@@ -49,145 +63,514 @@ class PascalLexer:
         ".": "DOT"
     }
 
-    def __init__(self, input_file):
-        self.input_file = open(input_file, 'r', encoding='utf-8')
-        self.current_line = 0
-        self.current_column = 0
+    # Классы символов, которых нет в правилах явно
+    OTHER = "<other>"
+    UNICODE_DIGIT = "<digit>"
+
+    # Токены, которые разбираются автоматом, но не выдаются наружу
+    SKIPPED = {"WHITESPACE"}
+    COMMENTS = {"LINE_COMMENT", "BLOCK_COMMENT"}
+
+    _dfa = None
+    TOKEN_TYPES = None  # номер типа токена -> имя, заполняется вместе с _dfa
+
+    def __init__(self, input_file, block_size=None, use_mmap=False, skip_comments=False, first_line=1):
+        """block_size — читать файл блоками по столько символов, а не строками;
+        use_mmap — отобразить файл в память и декодировать его блоками оттуда;
+        skip_comments — не выдавать токены комментариев;
+        first_line — номер первой строки (для кусков файла при параллельном разборе).
+        """
+        self.skipped = self.SKIPPED | self.COMMENTS if skip_comments else self.SKIPPED
+        self.block_size = block_size or (1 << 20 if use_mmap else None)
+        self._mmap = None
+        if hasattr(input_file, 'read'):
+            # уже открытый текстовый поток, например io.StringIO
+            if use_mmap:
+                raise ValueError("use_mmap needs a file name, not a stream")
+            self.input_file = input_file
+        elif use_mmap:
+            self.input_file = open(input_file, 'rb')
+            if os.fstat(self.input_file.fileno()).st_size:
+                self._mmap = mmap.mmap(self.input_file.fileno(), 0, access=mmap.ACCESS_READ)
+            # тот же перевод \r\n и \r в \n, что делает текстовый режим open()
+            self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), True)
+            self._offset = 0
+        else:
+            self.input_file = open(input_file, 'r', encoding='utf-8')
+        self.current_line = first_line
+        self.current_column = 1
         self.buffer = ""
+        self.codes = b""
+        self.pos = 0
+        self.offset = 0  # позиция buffer[0] от начала файла, в символах
         self.eof = False
 
+        if PascalLexer._dfa is None:
+            PascalLexer._dfa = self._compile_rules()
+            PascalLexer.TOKEN_TYPES = sorted(set(PascalLexer._dfa.outputs.values()) | {"BAD"})
+            PascalLexer.TYPE_IDS = {name: i for i, name in enumerate(PascalLexer.TOKEN_TYPES)}
+        dfa = PascalLexer._dfa
+        self._classes = _CharClasses(dfa, dfa.column(" "), dfa.column(self.UNICODE_DIGIT), dfa.column(self.OTHER))
+
+    @classmethod
+    def _compile_rules(cls):
+        """Собирает все правила в один ДКА максимального совпадения.
+
+        Выход состояния — тип токена; при равной длине побеждает правило,
+        стоящее раньше в списке.
+        """
+        letters = string.ascii_letters + "_"
+        digits = string.digits
+        alphabet = set(letters + digits + "".join(cls.OPERATORS) + "'{}/ \t\n")
+        alphabet.update((cls.OTHER, cls.UNICODE_DIGIT))
+
+        def chars(symbols):
+            return union([literal(symbol) for symbol in sorted(symbols)])
+
+        def any_except(*excluded):
+            return chars(alphabet - set(excluded))
+
+        def word(text):
+            return concat([literal(ch) for ch in text])
+
+        def keyword(text):
+            return concat([union([literal(ch.lower()), literal(ch.upper())]) for ch in text])
+
+        number = plus(chars(set(digits) | {cls.UNICODE_DIGIT}))
+        rules = [
+            (plus(chars(" \t\n")), "WHITESPACE"),
+            (concat([word("//"), repeat(any_except("\n"))]), "LINE_COMMENT"),
+            (concat([literal("{"), repeat(any_except("}")), literal("}")]), "BLOCK_COMMENT"),
+            (concat([literal("'"), repeat(any_except("'", "\n")), literal("'")]), "STRING"),
+        ]
+        # ключевые слова без учёта регистра — раньше идентификатора, поэтому выигрывают у него
+        rules += [(keyword(word_), token_type) for word_, token_type in cls.KEYWORDS.items()]
+        rules += [
+            (concat([chars(letters), repeat(chars(letters + digits))]), "IDENTIFIER"),
+            (concat([number, literal("."), number]), "FLOAT"),
+            (number, "INTEGER"),
+        ]
+        rules += [(word(op), token_type) for op, token_type in cls.OPERATORS.items()]
+
+        return CompiledDFA(minimize(rules_to_dfa(rules)))
+
     def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
         self.input_file.close()
 
-    def read_next_line(self):
-        self.buffer = self.input_file.readline()
-        # self.buffer = self.buffer.replace("\u00A0", " ")
+    def __enter__(self):
+        return self
 
-        if not self.buffer:  # EOF
-            self.eof = True
-            self.buffer = ""
-        else:
-            self.current_line += 1
-        self.current_column = 1
+    def __exit__(self, *exc_info):
+        self.close()
 
-    def next_token(self):
-        while not self.eof or self.buffer:
-            if not self.buffer:
-                self.read_next_line()
-                if self.eof:
-                    return None
-
-            # Пропуск пробелов
-            while self.buffer and self.buffer[0].isspace():
-                self.buffer = self.buffer[1:]
-            #print(self.buffer)
-            if not self.buffer:  # Если строка пуста после обрезки
+    def __iter__(self):
+        """Поток токенов: for token in lexer."""
+        next_token = self.next_token
+        while True:
+            token = next_token()
+            if token is None:
+                return
+            yield token
+
+    def _read_text(self):
+        if self._mmap is not None:
+            chunk = self._mmap[self._offset:self._offset + self.block_size]
+            self._offset += len(chunk)
+            text = self._decoder.decode(chunk, final=not chunk)
+            # декодер может придержать хвост многобайтного символа или \r
+            while not text and chunk:
+                chunk = self._mmap[self._offset:self._offset + self.block_size]
+                self._offset += len(chunk)
+                text = self._decoder.decode(chunk, final=not chunk)
+            return text
+        if self.block_size is not None:
+            return self.input_file.read(self.block_size)
+        return self.input_file.readline()
+
+    def fill_buffer(self, min_size=0):
+        """Дописывает в буфер следующие строки (или блоки) файла; False в конце файла.
+
+        Уже разобранная часть буфера (до self.pos) отбрасывается. Читается не
+        меньше min_size символов: когда лексема не влезла в буфер, _scan
+        просит столько, сколько у неё уже есть, и буфер растёт вдвое, так что
+        длинная лексема копируется O(1) раз на символ, а не на каждую строку.
+        """
+        pieces = []
+        size = 0
+        while not self.eof and (not pieces or size < min_size):
+            text = self._read_text()
+            if not text:  # EOF
+                self.eof = True
+                break
+            pieces.append(text)
+            size += len(text)
+        if not pieces:
+            return False
+
+        text = "".join(pieces)
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos:] + text
+        self.codes = self.codes[self.pos:] + text.translate(self._classes).encode('latin-1')
+        self.pos = 0
+        return True
+
+    def _scan(self):
+        """Максимальное совпадение автоматом с позиции self.pos.
+
+        Возвращает (тип, начало, конец) в координатах буфера или None в конце файла.
+        """
+        dfa = PascalLexer._dfa
+        table = dfa.table
+        outputs = dfa.outputs  # ключи — только принимающие состояния
+
+        if self.pos >= len(self.codes) and not self.fill_buffer():
+            return None
+
+        start = self.pos
+        if self.buffer[start] == "{":
+            return self._scan_block_comment(start)
+        pos = start
+        state = dfa.start
+        last_state = -1
+        last_end = start
+        codes = self.codes
+        limit = len(codes)
+
+        while True:
+            if pos == limit:
+                # лексема не закончилась вместе с буфером — подтягиваем ещё текст
+                self.pos = start
+                if not self.fill_buffer(limit - start):
+                    break
+                pos -= start
+                last_end -= start
+                start = 0
+                codes = self.codes
+                limit = len(codes)
+            state = table[state + codes[pos]]
+            if state < 0:
+                break
+            pos += 1
+            if state in outputs:
+                last_state = state
+                last_end = pos
+
+        if last_state < 0:
+            first = self.buffer[start]
+            if first == "'":
+                raise SyntaxError(f"Unclosed string literal at line {self.current_line}.")
+            if first == "{":
+                raise SyntaxError(f"Unclosed block comment starting at line {self.current_line}.")
+            self.pos = start + 1
+            return "BAD", start, start + 1
+
+        self.pos = last_end
+        return outputs[last_state], start, last_end
+
+    def _scan_block_comment(self, start):
+        """Комментарий {...} ищется через str.find, а не автоматом по символу.
+
+        Результат тот же, что дал бы автомат: других правил на '{' нет.
+        """
+        end = self.buffer.find("}", start + 1)
+        while end < 0:
+            searched = len(self.buffer) - start
+            self.pos = start
+            if not self.fill_buffer(searched):
+                raise SyntaxError(f"Unclosed block comment starting at line {self.current_line}.")
+            start = 0
+            end = self.buffer.find("}", searched)
+        self.pos = end + 1
+        return "BLOCK_COMMENT", start, end + 1
+
+    def _next_raw(self):
+        """Следующий выдаваемый токен как (тип, начало, конец, строка, колонка).
+
+        Начало и конец — в координатах буфера; None в конце файла.
+        """
+        while True:
+            scanned = self._scan()
+            if scanned is None:
+                return None
+            token_type, start, end = scanned
+
+            line = self.current_line
+            column = self.current_column
+            # пробелы колонку не сдвигают, перевод строки сбрасывает её в 1
+            newlines = self.buffer.count("\n", start, end)
+            if newlines:
+                self.current_line += newlines
+                self.current_column = 1
+
+            if token_type in self.SKIPPED:
+                continue
+            if newlines:
+                self.current_column += end - self.buffer.rfind("\n", start, end) - 1
+            else:
+                self.current_column += end - start
+            # пропущенные комментарии колонку сдвигают, как и выданные
+            if token_type in self.skipped:
                 continue
 
-            self.current_column += len(self.buffer) - len(self.buffer.lstrip())
-
-            # Линейный комментарий
-            if self.buffer.startswith("//"):
-                match = re.match(r"//.*", self.buffer)
-                lexeme = match.group(0) if match else ""
-                token = Token("LINE_COMMENT", lexeme, self.current_line, self.current_column)
-                self.buffer = self.buffer[len(lexeme):]
-                self.current_column += len(lexeme)
-                return token
-
-            # Блочный комментарий
-            if self.buffer.startswith("{"):
-                comment_lines = []
-                start_line = self.current_line
-                start_column = self.current_column
-
-                while True:
-                    end_index = self.buffer.find("}")
-                    if end_index != -1:  # Закрытие найдено в текущей строке
-                        comment_lines.append(self.buffer[:end_index + 1])
-                        self.buffer = self.buffer[end_index + 1:]
-                        self.current_column += end_index + 1
-                        break
-                    else:  # Закрытие не найдено в текущей строке
-                        comment_lines.append(self.buffer)
-                        self.read_next_line()
-                        if self.eof:
-                            raise SyntaxError(f"Unclosed block comment starting at line {start_line}.")
-
-                lexeme = "".join(comment_lines)
-                token = Token("BLOCK_COMMENT", lexeme, start_line, start_column)
-                return token
-
-            # Строковый литерал
-            if self.buffer.startswith("'"):
-                match = re.match(r"'(.*?)'", self.buffer)
-                if match:
-                    lexeme = match.group(0)
-                    token = Token("STRING", lexeme, self.current_line, self.current_column)
-                    self.buffer = self.buffer[len(lexeme):]
-                    self.current_column += len(lexeme)
-                    return token
-                else:
-                    raise SyntaxError(f"Unclosed string literal at line {self.current_line}.")
-
-            # Идентификатор или ключевое слово
-            match = re.match(r"[a-zA-Z_][a-zA-Z0-9_]*", self.buffer)
-            if match:
-                lexeme = match.group(0)
-                token_type = self.KEYWORDS.get(lexeme.lower(), "IDENTIFIER")
-                token = Token(token_type, lexeme, self.current_line, self.current_column)
-                self.buffer = self.buffer[len(lexeme):]
-                self.current_column += len(lexeme)
-                return token
-
-            # Целое число или вещественное число
-            match = re.match(r"\d+(\.\d+)?", self.buffer)
-            if match:
-                lexeme = match.group(0)
-                token_type = "FLOAT" if "." in lexeme else "INTEGER"
-                token = Token(token_type, lexeme, self.current_line, self.current_column)
-                self.buffer = self.buffer[len(lexeme):]
-                self.current_column += len(lexeme)
-                return token
-
-            # Операторы и разделители
-            for op, token_type in sorted(self.OPERATORS.items(), key=lambda x: -len(x[0])):
-                if self.buffer.startswith(op):
-                    token = Token(token_type, op, self.current_line, self.current_column)
-                    self.buffer = self.buffer[len(op):]
-                    self.current_column += len(op)
-                    return token
-
-            # Некорректный символ
-            bad_char = self.buffer[0]
-            token = Token("BAD", bad_char, self.current_line, self.current_column)
-            self.buffer = self.buffer[1:]
-            self.current_column += 1
-            return token
-
-        return None
+            return token_type, start, end, line, column
+
+    def next_token(self):
+        raw = self._next_raw()
+        if raw is None:
+            return None
+        token_type, start, end, line, column = raw
+        return Token(token_type, self.buffer[start:end], line, column)
+
+    def scan_into(self, tokens):
+        """Дописывает все оставшиеся токены в TokenBuffer, не создавая объектов Token."""
+        type_ids = self.TYPE_IDS
+        next_raw = self._next_raw
+        append = tokens.append
+        while True:
+            raw = next_raw()
+            if raw is None:
+                return tokens
+            token_type, start, end, line, column = raw
+            append(type_ids[token_type], self.offset + start, end - start, line, column)
+
+
+class TokenBuffer:
+    """Токены по столбцам: параллельные массивы типа, смещения, длины, строки и колонки.
+
+    Лексемы не хранятся — они вырезаются из source по смещению, когда нужны.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.types = array('B')
+        self.starts = array('q')
+        self.lengths = array('I')
+        self.lines = array('I')
+        self.columns = array('I')
+
+    @classmethod
+    def from_file(cls, input_file, skip_comments=False):
+        with open(input_file, 'r', encoding='utf-8') as file:
+            source = file.read()
+        lexer = PascalLexer(io.StringIO(source), block_size=1 << 20, skip_comments=skip_comments)
+        return lexer.scan_into(cls(source))
+
+    def append(self, type_id, start, length, line, column):
+        self.types.append(type_id)
+        self.starts.append(start)
+        self.lengths.append(length)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def __len__(self):
+        return len(self.types)
+
+    def type_name(self, i):
+        return PascalLexer.TOKEN_TYPES[self.types[i]]
+
+    def lexeme(self, i):
+        start = self.starts[i]
+        return self.source[start:start + self.lengths[i]]
+
+    def token(self, i):
+        return Token(self.type_name(i), self.lexeme(i), self.lines[i], self.columns[i])
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self.token(i)
+
+
+class _CharClasses(dict):
+    """Отображение для str.translate: символ -> номер столбца ДКА лексера.
+
+    Символы вне явного алфавита классифицируются при первой встрече
+    (пробельные, цифры Юникода, прочие) и запоминаются.
+    """
+
+    def __init__(self, dfa, space, digit, other):
+        super().__init__()
+        for symbol in dfa.symbols:
+            if len(symbol) == 1:
+                self[ord(symbol)] = dfa.column(symbol)
+        self.space = space
+        self.digit = digit
+        self.other = other
+
+    def __missing__(self, key):
+        ch = chr(key)
+        if ch.isspace():
+            value = self.space
+        elif ch.isdecimal():
+            value = self.digit
+        else:
+            value = self.other
+        self[key] = value
+        return value
+
+# То, что может тянуться через перевод строки или прятать его: блочный
+# комментарий; строки и линейные комментарии заканчиваются в своей строке.
+_RESYNC_SPECIAL = re.compile(rb"\{|'|//")
+
+
+def find_split_points(data, parts):
+    """Байтовые смещения начал строк, по которым файл можно резать на parts кусков.
+
+    Быстрый предварительный проход: пропускаются блочные комментарии, строки
+    и линейные комментарии, резать можно только после перевода строки в
+    обычном коде. Все эти разделители — ASCII, поэтому искать их можно прямо
+    в UTF-8 байтах.
+    """
+    n = len(data)
+    targets = [n * i // parts for i in range(1, parts)]
+    splits = []
+    ti = 0
+    pos = 0
+
+    while ti < len(targets):
+        match = _RESYNC_SPECIAL.search(data, pos)
+        region_end = match.start() if match else n
+
+        while ti < len(targets) and targets[ti] < region_end:
+            newline = data.find(b"\n", max(targets[ti], pos), region_end)
+            if newline == -1:
+                break
+            split = newline + 1
+            if split < n and (not splits or split > splits[-1]):
+                splits.append(split)
+            while ti < len(targets) and targets[ti] < split:
+                ti += 1
+
+        if match is None:
+            break
+        special = match.group()
+        if special == b"{":
+            close = data.find(b"}", match.end())
+            if close == -1:
+                break  # незакрытый комментарий: дальше резать нельзя
+            pos = close + 1
+        else:
+            newline = data.find(b"\n", match.end())
+            if special == b"'":
+                quote = data.find(b"'", match.end())
+                if quote != -1 and (newline == -1 or quote < newline):
+                    pos = quote + 1
+                    continue
+            if newline == -1:
+                break
+            pos = newline
+
+    return splits
+
+
+def _count_lines(chunk):
+    """Число переводов строки в смысле текстового режима (\n, \r\n и одиночный \r)."""
+    return chunk.count(b"\n") + chunk.count(b"\r") - chunk.count(b"\r\n")
+
+
+def _lex_chunk(task):
+    """Разбор одного куска в процессе-работнике: (токены, текст SyntaxError или None)."""
+    input_file, start, end, first_line, skip_comments = task
+    with open(input_file, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    text = data.decode('utf-8').replace("\r\n", "\n").replace("\r", "\n")
+
+    lexer = PascalLexer(io.StringIO(text), block_size=1 << 20, skip_comments=skip_comments,
+                        first_line=first_line)
+    tokens = []
+    try:
+        for token in lexer:
+            tokens.append((token.type, token.lexeme, token.line, token.column))
+    except SyntaxError as error:
+        return tokens, str(error)
+    return tokens, None
+
+
+def lex_parallel(input_file, jobs=None, skip_comments=False):
+    """Параллельный разбор большого файла; токены те же и в том же порядке, что у next_token.
+
+    Файл режется по безопасным началам строк (find_split_points), куски
+    разбираются в пуле процессов, номера строк каждому куску заранее
+    сдвигаются на число строк до него, колонки в начале строки и так с 1.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    with open(input_file, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # кусков больше, чем процессов, чтобы работники не простаивали
+            bounds = [0] + find_split_points(data, jobs * 4) + [size]
+            tasks = []
+            line = 1
+            for start, end in zip(bounds, bounds[1:]):
+                tasks.append((input_file, start, end, line, skip_comments))
+                line += _count_lines(data[start:end])
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for tokens, error in pool.map(_lex_chunk, tasks):
+            for token in tokens:
+                yield Token(*token)
+            if error is not None:
+                raise SyntaxError(error)
+
+
+def write_tokens(lexer, output, echo=None, batch_size=4096):
+    """Пишет токены пачками: одна запись в файл (и в echo) на batch_size токенов."""
+    batch = []
+    try:
+        for token in lexer:
+            batch.append(str(token))
+            if len(batch) >= batch_size:
+                metrics.count("lexer.tokens", len(batch))
+                text = "\n".join(batch) + "\n"
+                output.write(text)
+                if echo is not None:
+                    echo.write(text)
+                batch.clear()
+    finally:
+        # при SyntaxError уже разобранные токены всё равно попадают в вывод
+        if batch:
+            metrics.count("lexer.tokens", len(batch))
+            text = "\n".join(batch) + "\n"
+            output.write(text)
+            if echo is not None:
+                echo.write(text)
+
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python PascalLexer.py <input_file> <output_file>")
+    options = dict(arg[2:].partition('=')[::2] for arg in sys.argv[1:] if arg.startswith('--'))
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+
+    if len(args) != 2:
+        print("Usage: python PascalLexer.py [--quiet] [--no-comments] [--block=SIZE] [--mmap] [--jobs=N] <input_file> <output_file>")
         sys.exit(1)
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    input_file = args[0]
+    output_file = args[1]
 
     # input_file = "in.txt"
     # output_file = "out.txt"
-    lexer = PascalLexer(input_file)
+    echo = None if 'quiet' in options else sys.stdout
+    if 'jobs' in options:
+        # --jobs без числа — по процессу на ядро
+        tokens = lex_parallel(input_file, int(options['jobs'] or 0) or None,
+                              skip_comments='no-comments' in options)
+        with metrics.timer("lexer"), open(output_file, 'w', buffering=1 << 20) as output:
+            write_tokens(tokens, output, echo=echo)
+    else:
+        block_size = int(options['block']) if options.get('block') else None
+        lexer = PascalLexer(input_file, block_size=block_size, use_mmap='mmap' in options,
+                            skip_comments='no-comments' in options)
 
-    with open(output_file, 'w') as output:
-        while True:
-            token = lexer.next_token()
-            if token is None:
-                break
-            print(token)
-            output.write(str(token) + '\n')
+        with metrics.timer("lexer"), lexer, open(output_file, 'w', buffering=1 << 20) as output:
+            write_tokens(lexer, output, echo=echo)
 
-    lexer.close()
+    if metrics.elapsed("lexer"):
+        metrics.gauge("lexer.tokens_per_second", metrics.counter("lexer.tokens") / metrics.elapsed("lexer"))
 
 if __name__ == "__main__":
-    main()
+    # общие флаги --metrics, --profile, --trace
+    metrics.run(main)
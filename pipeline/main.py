@@ -0,0 +1,130 @@
+import functools
+import importlib.util
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from automata import determinize, metrics, minimize, thompson_nfa
+from automata.table_io import load_automaton, save_automaton, table_order
+
+STAGES = ("nfa", "dfa", "min")
+# лабораторная, из которой берётся разбор источника
+SOURCE_LABS = {'grammar': 'lw3', 'regex': 'lw5'}
+
+
+@functools.lru_cache(maxsize=None)
+def load_lab(name):
+    """Импортирует lwN/main.py как модуль lwN_main, не запуская его main().
+
+    Модуль исполняется один раз на процесс и регистрируется в sys.modules.
+    """
+    module_name = f"{name}_main"
+    path = os.path.join(ROOT, name, 'main.py')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+
+def grammar_to_nfa(grammar_file):
+    """Грамматика -> автомат Мура, как в lw3 (файл читается потоково)."""
+    return load_lab('lw3').grammar_file_to_automaton(grammar_file)
+
+
+def regex_to_nfa(regex):
+    """Регулярное выражение -> НКА Томпсона, как в lw5."""
+    lw5 = load_lab('lw5')
+    return thompson_nfa(lw5.parse_regex(regex))
+
+
+def run_pipeline(source, kind, last_stage="dfa", emit=None, timings=None):
+    """Прогоняет цепочку стадий в памяти до last_stage включительно.
+
+    kind — 'grammar' (файл грамматики lw3), 'regex' (выражение lw5) или
+    'table' (готовый автомат в CSV/.aut). emit — {стадия: файл} для записи
+    промежуточных автоматов, timings — список, куда добавляются пары
+    (стадия, секунды). Возвращает автомат последней стадии.
+    """
+    emit = emit or {}
+    if timings is None:
+        timings = []
+
+    def timed(stage, build, *args):
+        started = time.perf_counter()
+        result = build(*args)
+        timings.append((stage, time.perf_counter() - started))
+        return result
+
+    if kind in SOURCE_LABS:
+        # импорт лабораторной не входит во время стадии nfa
+        load_lab(SOURCE_LABS[kind])
+
+    if kind == 'grammar':
+        automaton = timed("nfa", grammar_to_nfa, source)
+    elif kind == 'regex':
+        automaton = timed("nfa", regex_to_nfa, source)
+    elif kind == 'table':
+        automaton = timed("nfa", load_automaton, source)
+    else:
+        raise ValueError(f"Unknown source kind '{kind}'")
+
+    for stage in STAGES:
+        if stage != "nfa":
+            if stage == "dfa":
+                # между лабораторными автомат шёл через таблицу: та же нумерация
+                automaton = timed(stage, determinize, table_order(automaton))
+            else:
+                automaton = timed(stage, minimize, automaton)
+        if stage in emit:
+            timed(f"write {stage}", save_automaton, automaton, emit[stage])
+        if stage == last_stage:
+            return automaton
+    raise ValueError(f"Unknown stage '{last_stage}'")
+
+
+def main():
+    # выражение может начинаться с '-', поэтому оно передаётся только как --regex=...
+    options = {}
+    emit = {}
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('--'):
+            name, _, value = arg[2:].partition('=')
+            if name == 'emit':
+                stage, _, filename = value.partition(':')
+                emit[stage] = filename
+            else:
+                options[name] = value
+        else:
+            args.append(arg)
+
+    sources = [kind for kind in ('grammar', 'regex', 'table') if kind in options]
+    last_stage = options.get('stage') or ("min" if 'minimize' in options else "dfa")
+    if len(args) > 1 or len(sources) != 1 or last_stage not in STAGES or not set(emit) <= set(STAGES):
+        print("Usage: pipeline (--grammar=FILE | --regex=RE | --table=FILE) [--minimize | --stage=nfa|dfa|min]"
+              " [--emit=STAGE:FILE ...] [--times] [output.csv|output.aut]")
+        sys.exit(1)
+    if args:
+        emit[last_stage] = args[0]
+
+    timings = []
+    run_pipeline(options[sources[0]], sources[0], last_stage, emit, timings)
+    for stage in emit:
+        print(f"Moore automaton exported to {emit[stage]}")
+
+    if 'times' in options:
+        for stage, seconds in timings:
+            print(f"{stage:>10}: {seconds * 1000:9.2f} ms")
+        print(f"{'total':>10}: {sum(seconds for _, seconds in timings) * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    # общие флаги --metrics, --profile, --trace
+    metrics.run(main)